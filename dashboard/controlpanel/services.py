@@ -1,81 +1,271 @@
 """Service layer wrapping existing backup scripts."""
 from __future__ import annotations
 
+import asyncio
 import datetime as dt
+import fcntl
+import functools
+import io
 import json
 import os
+import re
 import subprocess
 import sys
-from dataclasses import dataclass
+import time
+import uuid
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Iterable, List, Tuple
+from typing import Any, Callable, Iterable, Iterator, List, Tuple
 
 from django.conf import settings
+from django.core.cache import cache
 
 SCRIPTS_DIR = Path(settings.SCRIPTS_PATH)
+SCRIPTS_DIR_STR = str(SCRIPTS_DIR)
+BACKUP_SCRIPT = str(SCRIPTS_DIR / "backup.py")
+RESTORE_SCRIPT = str(SCRIPTS_DIR / "restore.py")
 PYTHON_BIN = sys.executable
 RCLONE_REMOTE = os.getenv("RCLONE_REMOTE", "grdive:")
 CRON_CONTAINER = os.getenv("BACKUP_CONTAINER_NAME", "shared-pgbackup")
+SERVER_NAME = os.getenv("SERVER_NAME", "default")
+RECORDS_ROOT = f"{RCLONE_REMOTE}records/{SERVER_NAME}/"
 
-if str(SCRIPTS_DIR) not in sys.path:
-    sys.path.insert(0, str(SCRIPTS_DIR))
+if SCRIPTS_DIR_STR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR_STR)
 
 try:
     import backup as backup_module  # type: ignore
 except Exception:
     backup_module = None
 
+LIST_CACHE_TTL = float(os.getenv("DASHBOARD_LIST_TTL", "60"))
+CTX_CACHE_TTL = float(os.getenv("DASHBOARD_CTX_TTL", "10"))
+DB_LIST_TTL = float(os.getenv("DASHBOARD_DB_TTL", "60"))
+CTX_CACHE_KEY = f"controlpanel:dashboard:{RCLONE_REMOTE}:{SERVER_NAME}:{CRON_CONTAINER}"
+LIST_GEN_KEY = f"controlpanel:lsf:generation:{RCLONE_REMOTE}:{SERVER_NAME}"
+# Dump suffixes come from backup.py so listings follow its BACKUP_FORMATs
+DUMP_SUFFIXES = (
+    tuple(backup_module.DUMP_SUFFIXES.values())
+    if backup_module
+    else (".dump", ".sql", ".sql.gz")
+)
+JOB_LOG_LINES = 500
+# restore.py lines summarizing the outcome of a run
+RESTORE_STATUS_PREFIXES = ("[SUCCESS]", "[ERROR]", "ERROR:")
+JOB_HISTORY = 20
+# Jobs live in the shared cache so every worker process can report on them
+JOB_TTL = 24 * 3600
+JOB_PUBLISH_INTERVAL = 1.0
+# flock()ed while a job runs: one backup/restore at a time across all workers
+JOB_LOCK_PATH = Path(settings.DASHBOARD_LOCK_DIR) / "controlpanel-jobs.lock"
+# <year>/<month>/<day>/<file>, relative to RECORDS_ROOT
+_DUMP_PATH_RE = re.compile(r"^(\d{4})/(\d{1,2})/(\d{1,2})/([^/]+)$")
+# Pipe-delimited docker inspect template: status|health|started_at
+DOCKER_STATE_FORMAT = (
+    "{{.State.Status}}|"
+    "{{if .State.Health}}{{.State.Health.Status}}{{else}}unknown{{end}}|"
+    "{{.State.StartedAt}}"
+)
+LIST_FILES_CMD = [
+    "rclone",
+    "lsjson",
+    RECORDS_ROOT,
+    "--recursive",
+    "--files-only",
+    "--no-modtime",
+    "--fast-list",
+    # Only dump files matter; skips SHA256SUMS and stray uploads server-side
+    *(arg for suffix in DUMP_SUFFIXES for arg in ("--include", f"*{suffix}")),
+]
+DOCKER_STATE_CMD = [
+    "docker",
+    "inspect",
+    "--type",
+    "container",
+    "--format",
+    DOCKER_STATE_FORMAT,
+    CRON_CONTAINER,
+]
+
+try:
+    import docker  # type: ignore
+
+    # Long-lived client: keeps its connection to the Docker socket between renders
+    _docker_client = docker.from_env(timeout=2)
+except Exception:
+    _docker_client = None
+
 
 @dataclass
 class CommandResult:
     ok: bool
-    stdout: list[str]
+    stdout: bytes
     stderr: list[str]
 
+    def lines(self) -> Iterator[str]:
+        """Lazily decode stdout line by line."""
+        for raw in io.BytesIO(self.stdout):
+            yield raw.decode("utf-8", "replace").rstrip("\r\n")
+
+
+def _run_command(
+    cmd: list[str], cwd: Path | None = None, log: deque[str] | None = None
+) -> CommandResult:
+    """Execute command and capture stdout/stderr.
 
-def _run_command(cmd: list[str], cwd: Path | None = None) -> CommandResult:
-    """Execute command and capture stdout/stderr."""
+    When ``log`` is given, output is read while the command runs and every
+    line is appended to it; stderr is merged into stdout in that mode.
+    """
+    if log is not None:
+        return _stream_command(cmd, cwd, log)
     try:
         proc = subprocess.run(
             cmd,
             cwd=str(cwd) if cwd else None,
             capture_output=True,
-            text=True,
         )
     except FileNotFoundError:
-        return CommandResult(False, [], [f"Komut bulunamadı: {cmd[0]}"])
+        return CommandResult(False, b"", [f"Komut bulunamadı: {cmd[0]}"])
+
+    stderr_lines = proc.stderr.decode("utf-8", "replace").splitlines()
+    return CommandResult(proc.returncode == 0, proc.stdout or b"", stderr_lines)
+
+
+def _stream_command(cmd: list[str], cwd: Path | None, log: deque[str]) -> CommandResult:
+    """Run command with Popen, tailing its combined output into ``log``."""
+    try:
+        proc = subprocess.Popen(
+            cmd,
+            cwd=str(cwd) if cwd else None,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+        )
+    except FileNotFoundError:
+        return CommandResult(False, b"", [f"Komut bulunamadı: {cmd[0]}"])
+
+    chunks: list[bytes] = []
+    with proc.stdout:
+        for raw in proc.stdout:
+            chunks.append(raw)
+            log.append(raw.decode("utf-8", "replace").rstrip("\r\n"))
+    return CommandResult(proc.wait() == 0, b"".join(chunks), [])
+
+
+def _run_many(cmds: list[list[str]]) -> list[CommandResult]:
+    """Run independent commands concurrently, results in the order given."""
+
+    async def run_one(cmd: list[str], limit: asyncio.Semaphore) -> CommandResult:
+        async with limit:
+            try:
+                proc = await asyncio.create_subprocess_exec(
+                    *cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+                )
+            except FileNotFoundError:
+                return CommandResult(False, b"", [f"Komut bulunamadı: {cmd[0]}"])
+            stdout, stderr = await proc.communicate()
+        stderr_lines = stderr.decode("utf-8", "replace").splitlines()
+        return CommandResult(proc.returncode == 0, stdout or b"", stderr_lines)
+
+    async def run_all() -> list[CommandResult]:
+        limit = asyncio.Semaphore(max(4, os.cpu_count() or 1))
+        return await asyncio.gather(*(run_one(cmd, limit) for cmd in cmds))
+
+    return asyncio.run(run_all())
+
+
+def _listing_key(cmd: list[str]) -> str:
+    """Cache key for an rclone listing, scoped to the current listing generation."""
+    generation = cache.get_or_set(LIST_GEN_KEY, 0, None)
+    return f"controlpanel:lsf:{generation}:{'|'.join(cmd)}"
+
 
-    stdout_lines = proc.stdout.splitlines() if proc.stdout else []
-    stderr_lines = proc.stderr.splitlines() if proc.stderr else []
-    return CommandResult(proc.returncode == 0, stdout_lines, stderr_lines)
+def _get_listing(cmd: list[str]) -> CommandResult | None:
+    """Return a fresh cached listing shared by every dashboard worker, if any."""
+    return cache.get(_listing_key(cmd))
+
+
+def _set_listing(cmd: list[str], result: CommandResult) -> None:
+    cache.set(_listing_key(cmd), result, LIST_CACHE_TTL)
+
+
+def _cached_listing(cmd: list[str]) -> CommandResult:
+    """Run an rclone listing command, reusing a fresh cached result if present."""
+    cached = _get_listing(cmd)
+    if cached is not None:
+        return cached
+    result = _run_command(cmd)
+    if result.ok:
+        _set_listing(cmd, result)
+    return result
+
+
+def invalidate_listing_cache() -> None:
+    """Drop cached rclone listings so the next render reads the remote again."""
+    # Bumping the generation orphans every listing key at once; stale
+    # entries simply expire from the cache backend
+    try:
+        cache.incr(LIST_GEN_KEY)
+    except ValueError:
+        cache.set(LIST_GEN_KEY, 1, None)
+
+
+_JSON_DECODER = json.JSONDecoder()
 
 
 def _extract_json(lines: list[str]) -> tuple[list[str], dict[str, Any] | None]:
     """Split log lines and optional trailing JSON blob."""
-    for idx, line in enumerate(lines):
-        striped = line.strip()
-        if striped.startswith("{") and striped.endswith("}"):
-            try:
-                payload = json.loads("\n".join(lines[idx:]))
-                return lines[:idx], payload
-            except json.JSONDecodeError:
-                continue
+    # The JSON payload is printed last: find its closing brace, then try each
+    # line opening a brace above it, nearest first, until one decodes into an
+    # object ending exactly there. The decoder handles braces inside strings.
+    end = next(
+        (idx for idx in range(len(lines) - 1, -1, -1) if lines[idx].rstrip().endswith("}")),
+        None,
+    )
+    if end is None:
+        return lines, None
+
+    for start in range(end, -1, -1):
+        if not lines[start].lstrip().startswith("{"):
+            continue
+        text = "\n".join(lines[start : end + 1]).strip()
+        try:
+            payload, consumed = _JSON_DECODER.raw_decode(text)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(payload, dict) and consumed == len(text):
+            return lines[:start] + lines[end + 1 :], payload
     return lines, None
 
 
-def _list_cloud_folders() -> CommandResult:
-    """List date-based folders under records/."""
-    return _run_command(
-        ["rclone", "lsf", f"{RCLONE_REMOTE}records/", "--dirs-only", "--recursive"]
-    )
+def _list_cloud_files() -> CommandResult:
+    """List every file under records/ as JSON in a single recursive call."""
+    return _cached_listing(LIST_FILES_CMD)
 
 
-def _list_backup_files(date_folder: str) -> list[str]:
-    """List SQL filenames under a specific backup folder."""
-    result = _run_command(
-        ["rclone", "lsf", f"{RCLONE_REMOTE}records/{date_folder}", "--files-only"]
-    )
-    return [line.strip() for line in result.stdout if line.strip() and line.endswith(".sql")]
+def _ttl_cache(ttl: float) -> Callable[[Callable[[], Any]], Callable[[], Any]]:
+    """Memoize a zero-argument function for ``ttl`` seconds in the shared cache; exceptions are not cached."""
+
+    def decorator(func: Callable[[], Any]) -> Callable[[], Any]:
+        key = f"controlpanel:memo:{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper() -> Any:
+            value = cache.get(key)
+            if value is None:
+                value = func()
+                cache.set(key, value, ttl)
+            return value
+
+        return wrapper
+
+    return decorator
+
+
+@_ttl_cache(DB_LIST_TTL)
+def _fetch_databases() -> list[str]:
+    return backup_module.list_databases()
 
 
 def _available_databases() -> list[str]:
@@ -83,46 +273,88 @@ def _available_databases() -> list[str]:
     if not backup_module:
         return []
     try:
-        return backup_module.list_databases()
+        return list(_fetch_databases())
     except Exception:
         return []
 
 
-def _parse_backup_folders(limit: int = 7) -> tuple[list[dict[str, Any]], list[str]]:
+def _parse_backup_folders(
+    limit: int = 7, listing: CommandResult | None = None
+) -> tuple[list[dict[str, Any]], list[str]]:
     """Return parsed backup metadata and potential warnings."""
     warnings: list[str] = []
-    result = _list_cloud_folders()
+    result = listing or _list_cloud_files()
     if not result.ok:
         warnings.extend(result.stderr or ["Bulut klasörleri listelenemedi."])
         return [], warnings
 
+    try:
+        entries = json.loads(result.stdout or b"[]")
+    except ValueError:
+        warnings.append("Bulut dosya listesi çözümlenemedi.")
+        return [], warnings
+
+    # Only day-level dumps match, archived copies under olds/HH_MM/ do not
+    files_by_date: dict[tuple[int, int, int], list[str]] = defaultdict(list)
+    for entry in entries:
+        match = _DUMP_PATH_RE.match(entry.get("Path", ""))
+        if match and match.group(4).endswith(DUMP_SUFFIXES):
+            year, month, day = map(int, match.group(1, 2, 3))
+            files_by_date[(year, month, day)].append(match.group(4))
+
+    # (year, month, day) tuples sort like dates; only displayed rows get a date object
     rows: list[dict[str, Any]] = []
-    for raw in result.stdout:
-        folder = raw.rstrip("/")
-        parts = folder.split("/")
-        if len(parts) != 3:
-            continue
+    for year, month, day in sorted(files_by_date, reverse=True):
         try:
-            year, month, day = map(int, parts)
             date_obj = dt.date(year, month, day)
         except ValueError:
             continue
 
-        files = _list_backup_files(folder)
         rows.append(
             {
                 "date_obj": date_obj,
                 "date": date_obj.strftime("%Y-%m-%d"),
-                "files": files,
-                "raw": folder,
+                "files": sorted(files_by_date[(year, month, day)]),
+                "raw": f"{year}/{month}/{day}",
             }
         )
+        if len(rows) == limit:
+            break
 
-    rows.sort(key=lambda item: item["date_obj"], reverse=True)
-    return rows[:limit], warnings
+    return rows, warnings
+
+
+def _docker_sdk_status() -> str:
+    """Describe cron container state via the persistent docker-py client."""
+    try:
+        state = _docker_client.containers.get(CRON_CONTAINER).attrs["State"]
+    except Exception as exc:
+        return f"Docker durumu okunamadı: {exc}"
 
+    health = (state.get("Health") or {}).get("Status", "unknown")
+    status_message = f"Container {state.get('Status', 'unknown')} (health: {health})"
+    if state.get("StartedAt"):
+        status_message += f" • Başlangıç: {state['StartedAt']}"
+    return status_message
 
-def cron_health(latest_backup: dt.date | None) -> dict[str, Any]:
+
+def _docker_cli_status(result: CommandResult) -> str:
+    """Describe cron container state from ``docker inspect`` CLI output."""
+    if result.ok and result.stdout:
+        fields = next(result.lines()).split("|")
+        if len(fields) != 3:
+            return "Docker inspect çıktısı çözümlenemedi."
+        status, health, started = fields
+        status_message = f"Container {status or 'unknown'} (health: {health})"
+        if started:
+            status_message += f" • Başlangıç: {started}"
+        return status_message
+    if result.stderr:
+        return result.stderr[0]
+    return "Docker durumu okunamadı."
+
+
+def cron_health(latest_backup: dt.date | None, state: CommandResult | None = None) -> dict[str, Any]:
     """Inspect docker health information for cron container."""
     freshness: str
     if latest_backup:
@@ -136,29 +368,10 @@ def cron_health(latest_backup: dt.date | None) -> dict[str, Any]:
     else:
         freshness = "Bulutta hiç tarihli yedek bulunamadı."
 
-    cmd = [
-        "docker",
-        "inspect",
-        CRON_CONTAINER,
-        "--format",
-        "{{json .State}}",
-    ]
-    result = _run_command(cmd)
-    status_message = "Docker durumu okunamadı."
-
-    if result.ok and result.stdout:
-        try:
-            state = json.loads(result.stdout[0])
-            health = state.get("Health", {}).get("Status", "unknown")
-            status = state.get("Status", "unknown")
-            started = state.get("StartedAt", "")
-            status_message = f"Container {status} (health: {health})"
-            if started:
-                status_message += f" • Başlangıç: {started}"
-        except (json.JSONDecodeError, IndexError):
-            status_message = "Docker inspect çıktısı çözümlenemedi."
-    elif result.stderr:
-        status_message = result.stderr[0]
+    if _docker_client is not None and state is None:
+        status_message = _docker_sdk_status()
+    else:
+        status_message = _docker_cli_status(state or _run_command(DOCKER_STATE_CMD))
 
     return {
         "status": status_message,
@@ -168,15 +381,42 @@ def cron_health(latest_backup: dt.date | None) -> dict[str, Any]:
 
 
 def build_dashboard_context() -> dict[str, Any]:
+    """Return dashboard data, reusing a snapshot younger than DASHBOARD_CTX_TTL."""
+    ctx = cache.get(CTX_CACHE_KEY)
+    if ctx is None:
+        ctx = _collect_dashboard_context()
+        cache.set(CTX_CACHE_KEY, ctx, CTX_CACHE_TTL)
+    return ctx
+
+
+def invalidate_dashboard_cache() -> None:
+    """Forget the dashboard snapshot and rclone listings after a mutation."""
+    cache.delete(CTX_CACHE_KEY)
+    invalidate_listing_cache()
+
+
+def _collect_dashboard_context() -> dict[str, Any]:
     """Collect dashboard data from cloud storage and cron inspection."""
-    backups, warnings = _parse_backup_folders()
+    # Overlap the remote listing with docker inspect unless it is cached;
+    # with docker-py available the CLI call is not needed at all
+    listing = _get_listing(LIST_FILES_CMD)
+    state = None
+    if listing is None:
+        if _docker_client is None:
+            listing, state = _run_many([LIST_FILES_CMD, DOCKER_STATE_CMD])
+        else:
+            listing = _run_command(LIST_FILES_CMD)
+        if listing.ok:
+            _set_listing(LIST_FILES_CMD, listing)
+
+    backups, warnings = _parse_backup_folders(listing=listing)
     latest = backups[0] if backups else None
     latest_info = {
         "date": latest["date"] if latest else None,
         "count": len(latest["files"]) if latest else 0,
         "warnings": warnings,
     }
-    cron_info = cron_health(latest["date_obj"] if latest else None)
+    cron_info = cron_health(latest["date_obj"] if latest else None, state)
 
     return {
         "latest_backup": latest_info,
@@ -187,12 +427,13 @@ def build_dashboard_context() -> dict[str, Any]:
     }
 
 
-def run_backup() -> Tuple[bool, List[str]]:
+def run_backup(log: deque[str] | None = None) -> Tuple[bool, List[str]]:
     """Trigger backup script and return success flag with details."""
-    cmd = [PYTHON_BIN, str(SCRIPTS_DIR / "backup.py"), "--json"]
-    result = _run_command(cmd, cwd=SCRIPTS_DIR)
-    log_lines, payload = _extract_json(result.stdout)
-    details: list[str] = log_lines[:]
+    cmd = [PYTHON_BIN, BACKUP_SCRIPT, "--json"]
+    result = _run_command(cmd, cwd=SCRIPTS_DIR_STR, log=log)
+    log_lines, payload = _extract_json(list(result.lines()))
+    # A job already shows the streamed output as its tail, only add the summary
+    details: list[str] = [] if log is not None else log_lines[:]
 
     if payload:
         status = payload.get("status")
@@ -206,21 +447,124 @@ def run_backup() -> Tuple[bool, List[str]]:
     success = payload is not None and payload.get("status") in {"success", "partial"}
     if not payload:
         success = result.ok
-    return success, details or ["Çıktı alınamadı."]
+    if not details and not (log is not None and log_lines):
+        details = ["Çıktı alınamadı."]
+    return success, details
 
 
-def run_restore(db: str, date: str | None, skip_safety: bool) -> Tuple[bool, List[str]]:
+def run_restore(
+    db: str, date: str | None, skip_safety: bool, log: deque[str] | None = None
+) -> Tuple[bool, List[str]]:
     """Trigger restore script for given database."""
-    cmd: list[str] = [PYTHON_BIN, str(SCRIPTS_DIR / "restore.py"), db]
+    cmd: list[str] = [PYTHON_BIN, RESTORE_SCRIPT, db]
     clean_date = date.strip() if date else ""
     if clean_date:
         cmd.append(clean_date)
     if skip_safety:
         cmd.append("--skip-safety-backup")
 
-    result = _run_command(cmd, cwd=SCRIPTS_DIR)
-    details = result.stdout + [f"Hata: {line}" for line in result.stderr]
-    return result.ok, details or ["Restore betiğinden çıktı alınamadı."]
+    result = _run_command(cmd, cwd=SCRIPTS_DIR_STR, log=log)
+    lines = list(result.lines())
+    # A job already shows the streamed output as its tail, only add the outcome
+    if log is not None:
+        details = [line for line in lines if line.startswith(RESTORE_STATUS_PREFIXES)]
+    else:
+        details = lines
+    details += [f"Hata: {line}" for line in result.stderr]
+    if not details and not (log is not None and lines):
+        details = ["Restore betiğinden çıktı alınamadı."]
+    return result.ok, details
+
+
+@dataclass
+class Job:
+    """Backup/restore run executed in the background job runner."""
+
+    id: str
+    kind: str
+    state: str = "queued"
+    tail: deque[str] = field(default_factory=lambda: deque(maxlen=JOB_LOG_LINES))
+    details: list[str] = field(default_factory=list)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "state": self.state,
+            "tail": list(self.tail),
+            "details": self.details,
+        }
+
+
+class _JobLog(deque):
+    """Log tail of a running job, republished to the cache at most once a second."""
+
+    def __init__(self, job: Job) -> None:
+        super().__init__(maxlen=JOB_LOG_LINES)
+        self.job = job
+        self.published = 0.0
+
+    def append(self, line: str) -> None:
+        super().append(line)
+        now = time.monotonic()
+        if now - self.published >= JOB_PUBLISH_INTERVAL:
+            self.published = now
+            _save_job(self.job)
+
+
+def _job_key(job_id: str) -> str:
+    return f"controlpanel:job:{job_id}"
+
+
+def _save_job(job: Job) -> None:
+    cache.set(_job_key(job.id), job.as_dict(), JOB_TTL)
+
+
+# In-process queue; the file lock below serializes jobs across worker processes
+_job_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="controlpanel-job")
+
+
+def _execute_job(job: Job, func: Callable[..., Tuple[bool, List[str]]], kwargs: dict[str, Any]) -> None:
+    JOB_LOCK_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with open(JOB_LOCK_PATH, "a") as lock:
+        # Stays "queued" while another worker's job holds the lock
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        job.state = "running"
+        job.tail = _JobLog(job)
+        _save_job(job)
+        try:
+            success, details = func(log=job.tail, **kwargs)
+        except Exception as exc:
+            job.state = "failed"
+            job.details = [f"Hata: {exc}"]
+        else:
+            job.state = "success" if success else "failed"
+            job.details = details
+        finally:
+            _save_job(job)
+            invalidate_dashboard_cache()
+
+
+def _submit_job(kind: str, func: Callable[..., Tuple[bool, List[str]]], **kwargs: Any) -> str:
+    job = Job(id=uuid.uuid4().hex, kind=kind)
+    _save_job(job)
+    _job_executor.submit(_execute_job, job, func, kwargs)
+    return job.id
+
+
+def submit_backup() -> str:
+    """Queue a backup run and return its job id."""
+    return _submit_job("backup", run_backup)
+
+
+def submit_restore(db: str, date: str | None, skip_safety: bool) -> str:
+    """Queue a restore run and return its job id."""
+    return _submit_job("restore", run_restore, db=db, date=date, skip_safety=skip_safety)
+
+
+def job_status(job_id: str) -> dict[str, Any] | None:
+    """Return state and log tail of a background job, None if unknown."""
+    return cache.get(_job_key(job_id))
 
 
 def get_cron_status() -> Iterable[str]:
@@ -8,6 +8,7 @@ app_name = "controlpanel"
 urlpatterns = [
     path("", views.DashboardView.as_view(), name="dashboard"),
     path("backups/run/", views.TriggerBackupView.as_view(), name="trigger-backup"),
+    path("backups/status/<str:job_id>/", views.JobStatusView.as_view(), name="job-status"),
     path("restores/run/", views.TriggerRestoreView.as_view(), name="trigger-restore"),
     path("cron/status/", views.CronStatusView.as_view(), name="cron-status"),
 ]
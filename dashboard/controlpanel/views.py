@@ -2,13 +2,20 @@
 from __future__ import annotations
 
 from django.contrib import messages
-from django.http import HttpRequest, HttpResponse
+from django.http import Http404, HttpRequest, HttpResponse, JsonResponse
 from django.shortcuts import redirect, render
 from django.urls import reverse
 from django.views import View
 
 from . import forms, services
 
+SESSION_JOBS_KEY = "controlpanel_jobs"
+
+
+def _remember_job(request: HttpRequest, job_id: str) -> None:
+    jobs = request.session.get(SESSION_JOBS_KEY, [])
+    request.session[SESSION_JOBS_KEY] = [job_id, *jobs][: services.JOB_HISTORY]
+
 
 class DashboardView(View):
     template_name = "controlpanel/dashboard.html"
@@ -17,6 +24,8 @@ class DashboardView(View):
         context = services.build_dashboard_context()
         context["backup_form"] = forms.BackupForm()
         context["restore_form"] = forms.RestoreForm()
+        jobs = (services.job_status(job_id) for job_id in request.session.get(SESSION_JOBS_KEY, []))
+        context["jobs"] = [job for job in jobs if job]
         return render(request, self.template_name, context)
 
 
@@ -28,13 +37,8 @@ class TriggerBackupView(View):
                 messages.error(request, error.as_text())
             return redirect(reverse("controlpanel:dashboard"))
 
-        success, details = services.run_backup()
-        if success:
-            messages.success(request, "Yedekleme başlatıldı.")
-        else:
-            messages.error(request, "Yedekleme başlatılamadı.")
-        for line in details:
-            messages.info(request, line)
+        _remember_job(request, services.submit_backup())
+        messages.success(request, "Yedekleme kuyruğa alındı.")
         return redirect(reverse("controlpanel:dashboard"))
 
 
@@ -42,25 +46,30 @@ class TriggerRestoreView(View):
     def post(self, request: HttpRequest) -> HttpResponse:
         form = forms.RestoreForm(request.POST)
         if form.is_valid():
-            success, details = services.run_restore(
+            job_id = services.submit_restore(
                 db=form.cleaned_data["database"],
                 date=form.cleaned_data["date"],
                 skip_safety=form.cleaned_data["skip_safety_backup"],
             )
-            if success:
-                messages.success(request, "Geri yükleme işlemi başlatıldı.")
-            else:
-                messages.error(request, "Geri yükleme sırasında hata oluştu.")
-            for line in details:
-                messages.info(request, line)
+            _remember_job(request, job_id)
+            messages.success(request, "Geri yükleme işlemi kuyruğa alındı.")
         else:
             for error in form.errors.values():
                 messages.error(request, error.as_text())
         return redirect(reverse("controlpanel:dashboard"))
 
 
+class JobStatusView(View):
+    def get(self, request: HttpRequest, job_id: str) -> HttpResponse:
+        status = services.job_status(job_id)
+        if status is None:
+            raise Http404("İşlem bulunamadı.")
+        return JsonResponse(status)
+
+
 class CronStatusView(View):
     def post(self, request: HttpRequest) -> HttpResponse:
+        services.invalidate_dashboard_cache()
         for line in services.get_cron_status():
             messages.info(request, line)
         return redirect(reverse("controlpanel:dashboard"))
@@ -76,6 +76,20 @@ else:
     }
 
 
+# File-backed so cached rclone listings and dashboard snapshots are shared
+# between every worker process instead of each paying the remote round-trip
+DASHBOARD_CACHE_DIR = os.getenv("DASHBOARD_CACHE_DIR", "/tmp/sharedpanel-cache")
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": DASHBOARD_CACHE_DIR,
+    }
+}
+# Holds the lock file that runs one backup/restore job at a time across
+# workers; a local directory whatever the cache backend is
+DASHBOARD_LOCK_DIR = Path(os.getenv("DASHBOARD_LOCK_DIR", DASHBOARD_CACHE_DIR))
+
+
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
     {"NAME": "django.contrib.auth.password_validation.MinimumLengthValidator"},
@@ -1,14 +1,26 @@
 #!/usr/bin/env python3
 """
 Automated PostgreSQL backup system with cloud-ready architecture.
-Runs daily via cron, dumps all databases to separate SQL files.
+Runs daily via cron, dumps all databases to separate compressed dump files
+(pg_dump custom format by default).
 """
 import os
+import fcntl
+import gzip
+import hashlib
+import mmap
+import shutil
 import subprocess
 import pathlib
 import datetime
 import sys
 import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+try:
+    import psycopg2
+except ImportError:  # psql CLI fallback
+    psycopg2 = None
 
 PGHOST = os.getenv("POSTGRES_HOST")
 PGPORT = os.getenv("POSTGRES_PORT")
@@ -17,9 +29,48 @@ PGPASSWORD = os.getenv("POSTGRES_PASSWORD")
 RETENTION_DAYS = int(os.getenv("BACKUP_RETENTION_DAYS", "15"))
 RCLONE_REMOTE = os.getenv("RCLONE_REMOTE", "grdive:")
 SERVER_NAME = os.getenv("SERVER_NAME", "default")
+# Child process environment, built once and shared (subprocess never mutates it)
+PG_ENV = {**os.environ, "PGPASSWORD": PGPASSWORD} if PGPASSWORD else dict(os.environ)
+BACKUP_PARALLELISM = int(os.getenv("BACKUP_PARALLELISM", "0"))
+BACKUP_FORMAT = os.getenv("BACKUP_FORMAT", "custom")
+BACKUP_LOCAL_STAGE = os.getenv("BACKUP_LOCAL_STAGE", "0") == "1"
+SHM_DIR = "/dev/shm"
+# Parent dir for every temp dir (dumps, downloads); e.g. a tmpfs mount
+PG_TMP = os.getenv("PG_TMP") or None
+# rclone tuning shared by every copy/list call
+RCLONE_TRANSFERS = os.getenv("RCLONE_TRANSFERS", "32")
+RCLONE_CHECKERS = os.getenv("RCLONE_CHECKERS", "32")
+RCLONE_COPY_FLAGS = [
+    "--transfers", RCLONE_TRANSFERS,
+    "--checkers", RCLONE_CHECKERS,
+    "--multi-thread-streams", "8",
+]
+# Recursive listings in one request where the backend supports it
+RCLONE_LIST_FLAGS = ["--fast-list"]
+# Kernel buffer for pipes between dump/upload processes (Linux default: 64 KiB)
+PIPE_SIZE = 1 << 20
+# pg_dump compression for .dump files (METHOD[:LEVEL], zstd needs pg_dump 16+)
+BACKUP_COMPRESSION = os.getenv("BACKUP_COMPRESSION", "zstd:3")
+# pg_dump options for .dump files: custom archive, compressed, pg_restore-able
+CUSTOM_DUMP_ARGS = ["-Fc", "-Z", BACKUP_COMPRESSION]
+
+# Dump file suffix per BACKUP_FORMAT, newest format first so restores prefer it
+DUMP_SUFFIXES = {
+    "custom": ".dump",
+    "gzip": ".sql.gz",
+    "plain": ".sql",
+}
+
+
+def widen_pipe(stream):
+    """Grow a pipe's buffer to PIPE_SIZE so fast writers block less; best effort"""
+    try:
+        fcntl.fcntl(stream.fileno(), getattr(fcntl, "F_SETPIPE_SZ", 1031), PIPE_SIZE)
+    except OSError:
+        pass  # Over /proc/sys/fs/pipe-max-size or not a pipe: keep the default
 
 
-def run(cmd, env=None, check=True, capture=False, cwd=None):
+def run(cmd, env=None, check=True, capture=False, cwd=None, input=None):
     """Execute shell command with optional environment"""
     print(f"[RUN] {' '.join(cmd)}")
     return subprocess.run(
@@ -27,63 +78,290 @@ def run(cmd, env=None, check=True, capture=False, cwd=None):
         env=env,
         check=check,
         cwd=cwd,
+        input=input,
         stdout=subprocess.PIPE if capture else None,
         stderr=subprocess.STDOUT if capture else None,
     )
 
 
+def psql_script(db: str, sql: str, /, check: bool = True, quiet: bool = False, **variables: str):
+    """
+    Run the sql script through psql on db, stopping at the first error.
+    `variables` are set with -v for :'name' (literal) and :"name" (identifier)
+    references; psql only interpolates them in scripts read from stdin/-f,
+    not -c. Returns the CompletedProcess, stdout (tuples only, unaligned)
+    and stderr captured as text.
+    """
+    cmd = ["psql", "-h", PGHOST, "-p", PGPORT, "-U", PGUSER, "-d", db, "-qtA", "-v", "ON_ERROR_STOP=1"]
+    for name, value in variables.items():
+        cmd += ["-v", f"{name}={value}"]
+    if not quiet:
+        print(f"[RUN] {' '.join(cmd)}")
+    return subprocess.run(cmd, env=PG_ENV, check=check, input=sql, capture_output=True, text=True)
+
+
+_admin_conn = None
+
+
+def admin_connection():
+    """
+    Shared autocommit connection to the postgres maintenance database.
+    Opened on first use and reopened if the previous one was closed.
+    """
+    global _admin_conn
+    if _admin_conn is None or _admin_conn.closed:
+        _admin_conn = psycopg2.connect(
+            host=PGHOST,
+            port=PGPORT,
+            user=PGUSER,
+            password=PGPASSWORD,
+            dbname="postgres",
+        )
+        _admin_conn.autocommit = True
+    return _admin_conn
+
+
+def admin_query(sql: str, params=None) -> list[tuple]:
+    """
+    Run sql on the shared admin connection and return its rows ([] for none).
+    A connection the server dropped (restart, idle timeout) only shows up as
+    closed once used, so the query is retried once on a fresh connection.
+    """
+    for retry in (False, True):
+        conn = admin_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(sql, params)
+                return cur.fetchall() if cur.description else []
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            if retry or not conn.closed:
+                raise
+
+
 def list_databases():
     """Get list of all non-template databases"""
-    env = os.environ.copy()
-    env["PGPASSWORD"] = PGPASSWORD
     sql = "SELECT datname FROM pg_database WHERE datistemplate=false AND datname<>'postgres';"
+    if psycopg2 is not None:
+        return [row[0] for row in admin_query(sql)]
+
     res = run(
         ["psql", "-h", PGHOST, "-p", PGPORT, "-U", PGUSER, "-tA", "-c", sql],
-        env=env,
+        env=PG_ENV,
         capture=True,
     )
     return [x.strip() for x in (res.stdout or b"").decode().splitlines() if x.strip()]
 
 
+def existing_databases(names: list[str]) -> set[str]:
+    """Subset of names that exist as databases, in a single query"""
+    if not names:
+        return set()
+    if psycopg2 is not None:
+        rows = admin_query("SELECT datname FROM pg_database WHERE datname = ANY(%s);", (list(names),))
+        return {row[0] for row in rows}
+
+    literals = ", ".join(f":'db{i}'" for i in range(len(names)))
+    res = psql_script(
+        "postgres",
+        f"SELECT datname FROM pg_database WHERE datname IN ({literals});\n",
+        check=False,
+        **{f"db{i}": name for i, name in enumerate(names)},
+    )
+    if res.returncode != 0:
+        return set()
+    return {line for line in res.stdout.splitlines() if line} & set(names)
+
+
+def database_exists(dbname: str) -> bool:
+    """Check if a database exists (parameterized, safe for any name)"""
+    return dbname in existing_databases([dbname])
+
+
+def database_sizes(databases: list[str]) -> int:
+    """Total on-disk size in bytes of the given databases (upper bound for plain dumps)"""
+    if not databases:
+        return 0
+    if psycopg2 is not None:
+        rows = admin_query(
+            "SELECT COALESCE(SUM(pg_database_size(datname)), 0) FROM pg_database WHERE datname = ANY(%s);",
+            (databases,),
+        )
+        return int(rows[0][0])
+
+    literals = ", ".join(f":'db{i}'" for i in range(len(databases)))
+    res = psql_script(
+        "postgres",
+        f"SELECT COALESCE(SUM(pg_database_size(datname)), 0) FROM pg_database WHERE datname IN ({literals});\n",
+        **{f"db{i}": db for i, db in enumerate(databases)},
+    )
+    return int(res.stdout.strip() or 0)
+
+
+def staging_base(databases: list[str]):
+    """
+    Pick the parent directory for local dump staging: PG_TMP if configured,
+    else tmpfs (/dev/shm) when it can hold the estimated dump size, so writes
+    and the final cleanup never touch disk; otherwise None (tempfile's default).
+    """
+    if PG_TMP:
+        return PG_TMP
+    if not os.path.isdir(SHM_DIR):
+        return None
+    try:
+        estimated = database_sizes(databases)
+        if shutil.disk_usage(SHM_DIR).free > estimated:
+            return SHM_DIR
+    except Exception as e:
+        print(f"[WARNING] Could not size staging area, using default temp dir: {e}")
+    return None
+
+
+def dump_filename(name: str) -> str:
+    """Dump file name for `name` in the configured BACKUP_FORMAT"""
+    try:
+        return f"{name}{DUMP_SUFFIXES[BACKUP_FORMAT]}"
+    except KeyError:
+        raise ValueError(
+            f"Unknown BACKUP_FORMAT: {BACKUP_FORMAT} (expected one of: {', '.join(DUMP_SUFFIXES)})"
+        ) from None
+
+
+def is_dump_file(filename: str) -> bool:
+    """True if filename looks like a database dump in any supported format"""
+    return filename.endswith(tuple(DUMP_SUFFIXES.values()))
+
+
+def pg_dump_cmd(db: str, filename: str) -> list[str]:
+    """pg_dump command line producing the format implied by filename's suffix"""
+    cmd = ["pg_dump", "-h", PGHOST, "-p", PGPORT, "-U", PGUSER, "-d", db]
+    if filename.endswith(".dump"):
+        cmd += CUSTOM_DUMP_ARGS
+    return cmd
+
+
 def dump_single_db(db: str, output_path: pathlib.Path):
     """
-    Dump a single database to SQL file.
+    Dump a single database to a file.
     Reusable function for both automated and manual backups.
+    .dump files are pg_dump custom archives, .sql.gz output is gzip-compressed
+    on the fly.
     
     Args:
         db: Database name
-        output_path: Full path to output .sql file
+        output_path: Full path to output .dump / .sql / .sql.gz file
     """
-    env = os.environ.copy()
-    env["PGPASSWORD"] = PGPASSWORD
-    
     output_path.parent.mkdir(parents=True, exist_ok=True)
     
-    cmd = [
-        "pg_dump",
-        "-h", PGHOST,
-        "-p", PGPORT,
-        "-U", PGUSER,
-        "-d", db,
-        "-f", str(output_path),
-    ]
-    
-    run(cmd, env=env)
+    cmd = pg_dump_cmd(db, output_path.name)
+
+    if output_path.suffix == ".gz":
+        # Stream pg_dump stdout straight into gzip, no uncompressed copy on disk
+        print(f"[RUN] {' '.join(cmd)} | gzip > {output_path.name}")
+        with gzip.open(output_path, "wb", compresslevel=3) as gz:
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, env=PG_ENV)
+            widen_pipe(proc.stdout)
+            shutil.copyfileobj(proc.stdout, gz, 1 << 20)
+            proc.stdout.close()
+        if proc.wait() != 0:
+            raise subprocess.CalledProcessError(proc.returncode, cmd)
+    else:
+        run(cmd + ["-f", str(output_path)], env=PG_ENV)
     print(f"[OK] Database dumped: {db} -> {output_path.name}")
 
 
+def file_sha256(path: pathlib.Path) -> str:
+    """SHA256 hex digest of a file, hashed in-process via mmap"""
+    with path.open("rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return hashlib.sha256().hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return hashlib.sha256(mm).hexdigest()
+
+
+class HashingWriter:
+    """Write-through wrapper that SHA256-hashes every byte passed to `raw`"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self.sha256.update(data)
+        return self.raw.write(data)
+
+    def flush(self):
+        self.raw.flush()
+
+
+def stream_db_to_cloud(db: str, remote_file: str) -> str:
+    """
+    Stream pg_dump output straight to cloud storage with rclone rcat.
+    .dump targets are compressed custom archives, output is gzip-compressed
+    on the fly when remote_file ends with .gz; nothing is written to local disk.
+
+    Args:
+        db: Database name
+        remote_file: Full rclone target (e.g. grdive:records/default/2025/10/7/db.dump)
+
+    Returns:
+        SHA256 hex digest of the uploaded bytes
+    """
+    dump_cmd = pg_dump_cmd(db, remote_file)
+    rcat_cmd = ["rclone", "rcat", remote_file]
+    print(f"[RUN] {' '.join(dump_cmd)} | {' '.join(rcat_cmd)}")
+
+    dump = subprocess.Popen(dump_cmd, stdout=subprocess.PIPE, env=PG_ENV)
+    rcat = subprocess.Popen(rcat_cmd, stdin=subprocess.PIPE)
+    widen_pipe(dump.stdout)
+    widen_pipe(rcat.stdin)
+    sink = HashingWriter(rcat.stdin)
+    try:
+        if remote_file.endswith(".gz"):
+            with gzip.GzipFile(fileobj=sink, mode="wb", compresslevel=3) as gz:
+                shutil.copyfileobj(dump.stdout, gz, 1 << 20)
+        else:
+            shutil.copyfileobj(dump.stdout, sink, 1 << 20)
+    except BrokenPipeError:
+        pass  # rclone exited early, its return code tells why
+    finally:
+        dump.stdout.close()  # Lets pg_dump receive SIGPIPE if rclone died
+        try:
+            rcat.stdin.close()
+        except BrokenPipeError:
+            pass
+
+    # rclone first: when the upload dies pg_dump only fails of SIGPIPE, and
+    # there is no partial object to delete
+    if rcat.wait() != 0:
+        dump.wait()
+        raise subprocess.CalledProcessError(rcat.returncode, rcat_cmd)
+    if dump.wait() != 0:
+        # Don't leave a truncated dump behind as the day's backup
+        run(["rclone", "deletefile", remote_file], check=False)
+        raise subprocess.CalledProcessError(dump.returncode, dump_cmd)
+
+    print(f"[OK] Database streamed: {db} -> {remote_file}")
+    return sink.sha256.hexdigest()
+
+
 def sha256sums(directory: pathlib.Path):
-    """Generate SHA256 checksums for all SQL files in directory"""
+    """Generate SHA256 checksums for all dump files in directory"""
     try:
-        files = [p.name for p in directory.glob("*.sql")]
+        with os.scandir(directory) as entries:
+            files = sorted(
+                e.name for e in entries if e.is_file(follow_symlinks=False) and is_dump_file(e.name)
+            )
         if not files:
             return
-        
+
+        # hashlib releases the GIL while hashing, so files are hashed in parallel
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as pool:
+            digests = pool.map(lambda fname: file_sha256(directory / fname), files)
+
         checksum_file = directory / "SHA256SUMS"
         with checksum_file.open("w") as f:
-            for fname in sorted(files):
-                res = run(["sha256sum", fname], cwd=str(directory), capture=True)
-                f.write(res.stdout.decode())
+            for fname, digest in zip(files, digests):
+                f.write(f"{digest}  {fname}\n")
         
         print(f"[OK] Checksums generated: {checksum_file.name}")
     except Exception as e:
@@ -98,7 +376,7 @@ def move_existing_to_olds(remote_path: str):
     Args:
         remote_path: Remote path to check (e.g. records/2025/10/7)
     """
-    # Check if any .sql files exist in the target path
+    # Check if any dump files exist in the target path
     result = run(
         ["rclone", "lsf", f"{RCLONE_REMOTE}{remote_path}", "--files-only"],
         capture=True,
@@ -110,10 +388,10 @@ def move_existing_to_olds(remote_path: str):
         return
     
     files = result.stdout.decode().strip().split("\n")
-    sql_files = [f for f in files if f.endswith(".sql")]
+    dump_files = [f for f in files if is_dump_file(f)]
     
-    if not sql_files:
-        # No SQL files, safe to proceed
+    if not dump_files:
+        # No dump files, safe to proceed
         return
     
     # Existing backup found, move to olds/HH_MM/
@@ -130,6 +408,7 @@ def move_existing_to_olds(remote_path: str):
             f"{RCLONE_REMOTE}{remote_path}",
             f"{RCLONE_REMOTE}{olds_path}",
             "--exclude", "olds/**",  # Don't move existing olds folder
+            *RCLONE_COPY_FLAGS,
         ],
         check=False,
     )
@@ -153,6 +432,7 @@ def upload_to_cloud(local_dir: pathlib.Path, remote_path: str):
             "copy",
             str(local_dir),
             f"{RCLONE_REMOTE}{remote_path}",
+            *RCLONE_COPY_FLAGS,
             "--progress",
         ]
     )
@@ -160,17 +440,33 @@ def upload_to_cloud(local_dir: pathlib.Path, remote_path: str):
     print(f"[OK] Upload completed: {remote_path}")
 
 
-def prune_cloud_backups(days: int):
+def prune_cloud_backups(days: int, base: str | None = None):
     """
-    Delete cloud backup folders older than specified days.
-    Searches recursively through year/month/day structure.
+    Delete cloud backups older than specified days under base
+    (default: this server's records/).
+    Lets rclone filter by age on the remote with a single delete call and
+    falls back to walking the year/month/day structure if that fails.
     """
-    print(f"[CLOUD-CLEANUP] Checking for backups older than {days} days...")
-    
-    base = f"records/{SERVER_NAME}/"
+    base = base or f"records/{SERVER_NAME}/"
+    print(f"[CLOUD-CLEANUP] Checking {base} for backups older than {days} days...")
+
+    result = run(
+        ["rclone", "delete", f"{RCLONE_REMOTE}{base}", "--min-age", f"{days}d", "--rmdirs"],
+        check=False,
+    )
+    if result.returncode == 0:
+        print("[OK] Cloud cleanup completed")
+        return
+
+    print("[WARN] rclone delete --min-age failed, pruning folder by folder")
+    prune_cloud_folders(base, days)
+
+
+def prune_cloud_folders(base: str, days: int):
+    """Purge year/month/day folders under base whose date is older than days"""
     # List all day-level directories recursively
     result = run(
-        ["rclone", "lsf", f"{RCLONE_REMOTE}{base}", "--dirs-only", "--recursive"],
+        ["rclone", "lsf", f"{RCLONE_REMOTE}{base}", "--dirs-only", "--recursive", *RCLONE_LIST_FLAGS],
         capture=True,
         check=False,
     )
@@ -180,6 +476,8 @@ def prune_cloud_backups(days: int):
         return
 
     cutoff_date = datetime.date.today() - datetime.timedelta(days=days)
+    # (year, month, day) tuples order like dates, no date object per folder
+    cutoff = (cutoff_date.year, cutoff_date.month, cutoff_date.day)
     folders = result.stdout.decode().strip().split("\n")
 
     for folder in folders:
@@ -188,25 +486,62 @@ def prune_cloud_backups(days: int):
         parts = folder.split("/")
         if len(parts) == 3:
             try:
-                year, month, day = int(parts[0]), int(parts[1]), int(parts[2])
-                folder_date = datetime.date(year, month, day)
-
-                if folder_date < cutoff_date:
-                    print(f"[CLOUD-DELETE] Removing old backup: {folder}")
-                    run(
-                        ["rclone", "purge", f"{RCLONE_REMOTE}{base}{folder}"],
-                        check=False,
-                    )
-            except (ValueError, IndexError):
+                folder_date = (int(parts[0]), int(parts[1]), int(parts[2]))
+            except ValueError:
                 continue
+
+            if folder_date < cutoff:
+                print(f"[CLOUD-DELETE] Removing old backup: {folder}")
+                run(
+                    ["rclone", "purge", f"{RCLONE_REMOTE}{base}{folder}"],
+                    check=False,
+                )
     
     print("[OK] Cloud cleanup completed")
 
 
+def free_connections() -> int | None:
+    """Connection slots still available to ordinary roles, or None if unknown"""
+    sql = (
+        "SELECT current_setting('max_connections')::int"
+        " - current_setting('superuser_reserved_connections')::int"
+        " - (SELECT count(*) FROM pg_stat_activity);"
+    )
+    try:
+        if psycopg2 is not None:
+            return int(admin_query(sql)[0][0])
+        res = run(
+            ["psql", "-h", PGHOST, "-p", PGPORT, "-U", PGUSER, "-d", "postgres", "-tA", "-c", sql],
+            env=PG_ENV,
+            capture=True,
+        )
+        return int((res.stdout or b"").decode().strip())
+    except Exception as e:
+        print(f"[WARNING] Could not read connection headroom: {e}")
+        return None
+
+
+def dump_workers(count: int) -> int:
+    """
+    Number of concurrent pg_dump processes for a backup of `count` databases.
+    Each pg_dump holds one connection, so at most half of the server's free
+    connection slots are used and applications keep the rest.
+    """
+    if BACKUP_PARALLELISM > 0:
+        workers = min(count, BACKUP_PARALLELISM)
+    else:
+        workers = min(count, (os.cpu_count() or 1) + 2, 20)
+
+    free = free_connections() if workers > 1 else None
+    if free is not None:
+        workers = min(workers, free // 2)
+    return max(1, workers)
+
+
 def backup_single_database(dbname: str):
     """
     Backup a single database to cloud storage (records/YYYY/MM/DD/).
-    Unlike backup_all_databases, this only uploads the single .sql file
+    Unlike backup_all_databases, this only uploads the single dump file
     without archiving or touching other files in the same date folder.
 
     Returns dict with backup status.
@@ -227,29 +562,56 @@ def backup_single_database(dbname: str):
         "errors": []
     }
 
-    temp_dir = pathlib.Path(tempfile.mkdtemp(prefix=f"backup_{dbname}_{timestamp}_"))
+    if not BACKUP_LOCAL_STAGE:
+        print(f"[{result['timestamp']}] Single database backup started: {dbname}")
+        filename = dump_filename(dbname)
+        try:
+            result["sha256"] = stream_db_to_cloud(dbname, f"{RCLONE_REMOTE}{remote_path}/{filename}")
+            result["file"] = f"{remote_path}/{filename}"
+            result["cloud_uploaded"] = True
+            print(f"[OK] Uploaded: {remote_path}/{filename}")
+        except subprocess.CalledProcessError as e:
+            if e.cmd[0] != "rclone":
+                result["status"] = "failed"
+                result["errors"].append(str(e))
+                print(f"[ERROR] Backup failed: {e}")
+                raise
+            error_msg = f"Cloud upload failed: {e}"
+            print(f"[ERROR] {error_msg}")
+            result["errors"].append(error_msg)
+            result["cloud_uploaded"] = False
+            result["status"] = "partial"
+
+        print(f"[{datetime.datetime.now().isoformat()}] Single database backup completed: {dbname}")
+        return result
+
+    temp_dir = pathlib.Path(
+        tempfile.mkdtemp(prefix=f"backup_{dbname}_{timestamp}_", dir=staging_base([dbname]))
+    )
 
     try:
         print(f"[{result['timestamp']}] Single database backup started: {dbname}")
         print(f"[TEMP] Using temporary directory: {temp_dir}")
 
         # Dump the single database
-        output_file = temp_dir / f"{dbname}.sql"
+        output_file = temp_dir / dump_filename(dbname)
         dump_single_db(dbname, output_file)
 
         # Upload only this file to cloud (rclone copy merges, won't touch other files)
         try:
-            print(f"[UPLOAD] Uploading {dbname}.sql to {RCLONE_REMOTE}{remote_path}")
+            print(f"[UPLOAD] Uploading {output_file.name} to {RCLONE_REMOTE}{remote_path}")
             run(
                 [
                     "rclone", "copy",
                     str(temp_dir),
                     f"{RCLONE_REMOTE}{remote_path}",
+                    *RCLONE_COPY_FLAGS,
+                    "--no-traverse",  # Single known file, don't list the destination
                     "--progress",
                 ]
             )
             result["cloud_uploaded"] = True
-            print(f"[OK] Uploaded: {remote_path}/{dbname}.sql")
+            print(f"[OK] Uploaded: {remote_path}/{output_file.name}")
         except subprocess.CalledProcessError as e:
             error_msg = f"Cloud upload failed: {e}"
             print(f"[ERROR] {error_msg}")
@@ -275,46 +637,74 @@ def backup_single_database(dbname: str):
     return result
 
 
-def backup_all_databases():
+def backup_all_streaming(databases: list[str], remote_path: str, result: dict):
     """
-    Main backup function: dump all databases to temp, upload to cloud, cleanup temp.
-    Returns dict with backup status for API/logging.
+    Stream every database straight to the cloud, then upload SHA256SUMS.
+    Checksums are computed from the bytes as they are uploaded.
     """
+    # Archive existing backup first, new dumps land directly in remote_path
+    move_existing_to_olds(remote_path)
+
+    digests = {}
+    with ThreadPoolExecutor(max_workers=dump_workers(len(databases))) as pool:
+        futures = {}
+        for db in databases:
+            print(f"[DUMP] Database: {db}")
+            filename = dump_filename(db)
+            remote_file = f"{RCLONE_REMOTE}{remote_path}/{filename}"
+            futures[pool.submit(stream_db_to_cloud, db, remote_file)] = (db, filename)
+
+        for future in as_completed(futures):
+            db, filename = futures[future]
+            try:
+                digests[filename] = future.result()
+                result["databases"].append(db)
+            except subprocess.CalledProcessError as e:
+                action = "upload" if e.cmd[0] == "rclone" else "dump"
+                error_msg = f"Failed to {action} {db}: {e}"
+                print(f"[ERROR] {error_msg}")
+                result["errors"].append(error_msg)
+
+    result["cloud_uploaded"] = bool(digests)
+    if not digests:
+        return
+
+    sums = "".join(f"{digests[name]}  {name}\n" for name in sorted(digests))
+    try:
+        run(["rclone", "rcat", f"{RCLONE_REMOTE}{remote_path}/SHA256SUMS"], input=sums.encode())
+        print("[OK] Checksums uploaded: SHA256SUMS")
+    except subprocess.CalledProcessError as e:
+        print(f"[WARN] Checksum upload failed: {e}")
+    print(f"[OK] Backup uploaded to cloud: {remote_path}")
+
+
+def backup_all_staged(databases: list[str], remote_path: str, timestamp: str, result: dict):
+    """Dump every database to a temp directory, upload it in one go, cleanup temp"""
     import tempfile
     import shutil
-    
-    today = datetime.date.today()
-    today_path = f"{today.year}/{today.month}/{today.day}"
-    remote_path = f"records/{SERVER_NAME}/{today_path}"
-    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-
-    result = {
-        "status": "success",
-        "timestamp": datetime.datetime.now().isoformat(),
-        "cloud_path": remote_path,
-        "databases": [],
-        "errors": []
-    }
 
     # Create temporary directory for backup
-    temp_dir = pathlib.Path(tempfile.mkdtemp(prefix=f"backup_{timestamp}_"))
+    temp_dir = pathlib.Path(tempfile.mkdtemp(prefix=f"backup_{timestamp}_", dir=staging_base(databases)))
 
     try:
-        print(f"[{result['timestamp']}] Backup started")
         print(f"[TEMP] Using temporary directory: {temp_dir}")
 
-        # Dump each database to temp
-        databases = list_databases()
-        for db in databases:
-            try:
+        # Dump databases to temp concurrently, each pg_dump is its own process
+        with ThreadPoolExecutor(max_workers=dump_workers(len(databases))) as pool:
+            futures = {}
+            for db in databases:
                 print(f"[DUMP] Database: {db}")
-                output_file = temp_dir / f"{db}.sql"
-                dump_single_db(db, output_file)
-                result["databases"].append(db)
-            except subprocess.CalledProcessError as e:
-                error_msg = f"Failed to dump {db}: {e}"
-                print(f"[ERROR] {error_msg}")
-                result["errors"].append(error_msg)
+                futures[pool.submit(dump_single_db, db, temp_dir / dump_filename(db))] = db
+
+            for future in as_completed(futures):
+                db = futures[future]
+                try:
+                    future.result()
+                    result["databases"].append(db)
+                except subprocess.CalledProcessError as e:
+                    error_msg = f"Failed to dump {db}: {e}"
+                    print(f"[ERROR] {error_msg}")
+                    result["errors"].append(error_msg)
 
         # Generate checksums
         sha256sums(temp_dir)
@@ -334,7 +724,43 @@ def backup_all_databases():
             print(f"[ERROR] {error_msg}")
             result["errors"].append(error_msg)
             result["cloud_uploaded"] = False
-        
+
+    finally:
+        # Always cleanup temp directory
+        if temp_dir.exists():
+            print(f"[CLEANUP] Removing temporary files: {temp_dir}")
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def backup_all_databases():
+    """
+    Main backup function: stream every database dump to cloud storage.
+    With BACKUP_LOCAL_STAGE=1 dumps go to a temp directory first and are
+    uploaded together afterwards.
+    Returns dict with backup status for API/logging.
+    """
+    today = datetime.date.today()
+    today_path = f"{today.year}/{today.month}/{today.day}"
+    remote_path = f"records/{SERVER_NAME}/{today_path}"
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+
+    result = {
+        "status": "success",
+        "timestamp": datetime.datetime.now().isoformat(),
+        "cloud_path": remote_path,
+        "databases": [],
+        "errors": []
+    }
+
+    try:
+        print(f"[{result['timestamp']}] Backup started")
+
+        databases = list_databases()
+        if BACKUP_LOCAL_STAGE:
+            backup_all_staged(databases, remote_path, timestamp, result)
+        else:
+            backup_all_streaming(databases, remote_path, result)
+
         if result["errors"]:
             result["status"] = "partial"
         
@@ -346,12 +772,6 @@ def backup_all_databases():
         print(f"[ERROR] Backup failed: {e}")
         raise
     
-    finally:
-        # Always cleanup temp directory
-        if temp_dir.exists():
-            print(f"[CLEANUP] Removing temporary files: {temp_dir}")
-            shutil.rmtree(temp_dir, ignore_errors=True)
-    
     return result
 
 
@@ -2,16 +2,18 @@ import os
 import asyncio
 import logging
 import json
-import contextlib
 import io
-import datetime
 import tempfile
-import shutil
 import subprocess
 from pathlib import Path
-from typing import Optional, List
+from typing import Optional
 from mcp.server.fastmcp import FastMCP
 
+try:
+    import psycopg2
+except ImportError:  # psql CLI fallback
+    psycopg2 = None
+
 # Import existing scripts
 import backup
 import mkdb
@@ -29,25 +31,19 @@ sec = TransportSecuritySettings(
 # Initialize FastMCP server
 mcp = FastMCP("Postgres Manager", host="0.0.0.0", port=8080, transport_security=sec)
 
+PGHOST = os.getenv("POSTGRES_HOST")
+PGPORT = os.getenv("POSTGRES_PORT")
+PGUSER = os.getenv("POSTGRES_USER")
+PGPASSWORD = os.getenv("POSTGRES_PASSWORD")
+PSQL_BASE = ("psql", "-h", PGHOST, "-p", PGPORT, "-U", PGUSER)
+# run_sql goes over libpq (psycopg2) unless psql is forced, e.g. for \d meta-commands
+SQL_VIA_PSQL = psycopg2 is None or os.getenv("MCP_SQL_VIA_PSQL", "0") == "1"
+SQL_FETCH_ROWS = 1000
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("mcp_server")
 
-def capture_output(func, *args, **kwargs):
-    """Helper to capture stdout/stderr from existing script functions"""
-    f = io.StringIO()
-    with contextlib.redirect_stdout(f), contextlib.redirect_stderr(f):
-        try:
-            func(*args, **kwargs)
-            success = True
-            error = None
-        except Exception as e:
-            success = False
-            error = str(e)
-            print(f"Error: {e}") # This goes to the captured buffer
-
-    return success, f.getvalue(), error
-
 @mcp.tool()
 def list_databases() -> str:
     """List all non-template databases."""
@@ -60,29 +56,33 @@ def list_databases() -> str:
 @mcp.tool()
 def create_database(dbname: str) -> str:
     """Create a new database."""
-    success, output, error = capture_output(mkdb.create_database, dbname)
-    if success:
-        # Also capture the connection info output
-        _, info_output, _ = capture_output(mkdb.print_connection_info, dbname)
-        return f"{output}\n{info_output}"
-    else:
-        return f"Failed to create database: {output}"
+    try:
+        messages = mkdb.create_database(dbname)
+    except subprocess.CalledProcessError as e:
+        return f"Failed to create database: {e}\n{e.stderr or ''}"
+    except Exception as e:
+        return f"Failed to create database: {str(e)}"
+    return "\n".join(messages) + "\n" + mkdb.connection_info(dbname)
 
 @mcp.tool()
-def backup_all_databases() -> str:
+async def backup_all_databases() -> str:
     """Trigger a full backup of all databases."""
     try:
-        # backup_all_databases returns a result dict
-        result = backup.backup_all_databases()
+        # backup_all_databases returns a result dict; it dumps databases in
+        # parallel, run it off the event loop so other tools stay responsive
+        result = await asyncio.to_thread(backup.backup_all_databases)
         return json.dumps(result, indent=2)
     except Exception as e:
         return f"Backup process failed: {str(e)}"
 
 @mcp.tool()
-def backup_database(dbname: str) -> str:
-    """Create a backup of a single database and upload to cloud (records/)."""
+async def backup_database(dbname: str) -> str:
+    """
+    Back up a single database to cloud (records/).
+    pg_dump output is streamed straight to rclone rcat, no local temp files.
+    """
     try:
-        result = backup.backup_single_database(dbname)
+        result = await asyncio.to_thread(backup.backup_single_database, dbname)
         return json.dumps(result, indent=2)
     except Exception as e:
         return f"Backup failed: {str(e)}"
@@ -91,20 +91,28 @@ def backup_database(dbname: str) -> str:
 def list_backups() -> str:
     """List available backup dates from cloud storage."""
     try:
+        restore.list_cloud_backups.cache_clear()
         dates = restore.list_cloud_backups()
         return json.dumps(dates, indent=2)
     except Exception as e:
         return f"Error listing backups: {str(e)}"
 
 @mcp.tool()
-def restore_database(dbname: str, date: Optional[str] = None) -> str:
+async def restore_database(dbname: str, date: Optional[str] = None, jobs: Optional[int] = None) -> str:
     """
     Restore a database from a backup.
 
     Args:
         dbname: The name of the database to restore.
         date: Optional date (YYYY-MM-DD) of the backup to restore. Defaults to latest.
+        jobs: Parallel pg_restore jobs for .dump backups. Defaults to RESTORE_JOBS.
     """
+    # The restore is a chain of blocking subprocesses, keep it off the event loop
+    return await asyncio.to_thread(_restore_database, dbname, date, jobs)
+
+
+def _restore_database(dbname: str, date: Optional[str], jobs: Optional[int]) -> str:
+    """Blocking body of restore_database"""
     # This is a complex operation. We'll try to replicate restore.py main logic carefully.
 
     output_log = io.StringIO()
@@ -114,7 +122,8 @@ def restore_database(dbname: str, date: Optional[str] = None) -> str:
         logger.info(msg)
 
     try:
-        # Find appropriate cloud backup
+        # Find appropriate cloud backup, the folder listing is cached per process
+        restore.list_cloud_backups.cache_clear()
         if date:
             date_folder = restore.find_cloud_backup(date)
         else:
@@ -122,47 +131,59 @@ def restore_database(dbname: str, date: Optional[str] = None) -> str:
 
         log(f"Restoring {dbname} from {date_folder}")
 
-        # Download backup from cloud to temp directory
-        temp_dir = Path(tempfile.mkdtemp(prefix="restore_"))
+        dump = restore.find_cloud_dump(date_folder, dbname)
+        if dump is None:
+            raise Exception(f"Backup file for {dbname} not found in {date_folder}")
+        stream = restore.should_stream(*dump, jobs=jobs)
+
+        # Large archives are downloaded to a temp directory for parallel pg_restore
+        temp_dir = Path(tempfile.mkdtemp(prefix="restore_", dir=backup.PG_TMP))
         try:
             # We can't easily capture output of subprocesses called inside these functions
             # unless we modify them or monkeypatch 'run'.
             # For now, we rely on the functions running and raising exceptions on failure.
 
-            log("Downloading backup...")
-            restore.download_from_cloud(date_folder, temp_dir, dbname=dbname)
+            # Download (unless streaming) and safety backup run side by side
+            log("Downloading backup and creating safety backup..." if not stream else "Creating safety backup...")
+            preflight = restore.db_preflight(dbname)
+            safety_path = restore.fetch_with_safety_backup(
+                dbname, date_folder, temp_dir, download=not stream, preflight=preflight
+            )
 
-            if not (temp_dir / f"{dbname}.sql").exists():
+            if not stream and restore.local_dump_path(temp_dir, dbname) is None:
                 raise Exception(f"Backup file for {dbname} not found in {date_folder}")
 
-            # Safety backup
-            log("Creating safety backup...")
-            safety_path = restore.safety_backup_before_restore(dbname)
             if safety_path:
                 log(f"Safety backup created at {safety_path}")
             else:
-                log("Safety backup skipped (DB might not exist)")
+                log("Safety backup skipped (DB missing or empty)")
 
             # Terminate connections and recreate DB
             log("Recreating database...")
-            restore.terminate_connections(dbname)
-            restore.drop_create_db(dbname)
+            restore.drop_create_db(dbname, exists=preflight.exists)
 
             # Restore data
-            log("Restoring data...")
-            restore.restore_from_folder(dbname, temp_dir)
+            if stream:
+                log(f"Streaming {dump[0]} from cloud...")
+                restore.restore_streaming(dbname, date_folder, dump[0])
+            else:
+                log("Restoring data...")
+                restore.restore_from_folder(dbname, temp_dir, jobs=jobs)
 
             log("Restore completed successfully.")
             return output_log.getvalue()
 
         finally:
-            shutil.rmtree(temp_dir, ignore_errors=True)
+            restore.remove_temp_dir(temp_dir, dump[0])
 
     except Exception as e:
+        # pg_restore's own messages say which statements failed
+        if isinstance(e, subprocess.CalledProcessError) and e.stderr:
+            log(e.stderr)
         return f"Restore failed: {str(e)}\nLog:\n{output_log.getvalue()}"
 
 @mcp.tool()
-def clone_database(source_db: str, target_db: str) -> str:
+async def clone_database(source_db: str, target_db: str) -> str:
     """
     Clone a database to a new database.
 
@@ -170,21 +191,22 @@ def clone_database(source_db: str, target_db: str) -> str:
         source_db: Name of the existing database to clone from.
         target_db: Name of the new database to create.
     """
-    if clone.db_exists(target_db):
+    existing = await asyncio.to_thread(clone.dbs_exist, [source_db, target_db])
+
+    if target_db in existing:
          return f"Error: Target database '{target_db}' already exists. Clone aborted."
 
-    if not clone.db_exists(source_db):
+    if source_db not in existing:
         return f"Error: Source database '{source_db}' does not exist."
 
     try:
-        clone.create_db(target_db)
-        clone.clone_db(source_db, target_db)
+        await asyncio.to_thread(clone.clone, source_db, target_db)
         return f"Successfully cloned '{source_db}' to '{target_db}'"
     except Exception as e:
         return f"Clone failed: {str(e)}"
 
 @mcp.tool()
-def delete_database(dbname: str, confirm: bool = False) -> str:
+async def delete_database(dbname: str, confirm: bool = False) -> str:
     """
     Delete a database. Requires confirmation.
 
@@ -195,42 +217,40 @@ def delete_database(dbname: str, confirm: bool = False) -> str:
     if not confirm:
         return f"WARNING: Database '{dbname}' will be PERMANENTLY DELETED. This cannot be undone.\nTo proceed, please call this function again with confirm=True."
 
-    if not restore.db_exists(dbname):
+    if not await asyncio.to_thread(restore.db_exists, dbname):
         return f"Database '{dbname}' does not exist."
 
     try:
-        # Terminate connections first
-        restore.terminate_connections(dbname)
-
-        # Drop database using subprocess directly or via a helper
-        # restore.drop_create_db drops and creates, we just want drop.
-        # We can use subprocess here directly or define a helper.
-        # Let's use subprocess directly for simplicity as we have access to env vars via os.environ if needed,
-        # but better to use the pattern in restore.py/mkdb.py if possible.
-        # restore.run is not easily importable as a standalone without 'restore.' prefix.
-
-        pg_host = os.getenv("POSTGRES_HOST")
-        pg_port = os.getenv("POSTGRES_PORT")
-        pg_user = os.getenv("POSTGRES_USER")
-        pg_password = os.getenv("POSTGRES_PASSWORD")
-
-        env = os.environ.copy()
-        if pg_password:
-            env["PGPASSWORD"] = pg_password
-
-        cmd = ["dropdb", "-h", pg_host, "-p", pg_port, "-U", pg_user, dbname]
-
-        subprocess.run(cmd, env=env, check=True, capture_output=True, text=True)
+        # Terminate connections and drop in one psql session. The script goes
+        # through stdin so psql quotes the name (:'db' literal, :"db" identifier)
+        # and runs each statement on its own; DROP DATABASE can't share a
+        # multi-statement -c transaction.
+        cmd = [*PSQL_BASE, "-d", "postgres", "-v", "ON_ERROR_STOP=1", "-v", f"db={dbname}"]
+        script = (
+            "SELECT pg_terminate_backend(pid) FROM pg_stat_activity "
+            "WHERE datname = :'db' AND pid <> pg_backend_pid();\n"
+            'DROP DATABASE :"db";\n'
+        )
+
+        # Only stderr is read (on failure); terminate results are discarded
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            env=backup.PG_ENV,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+        _, stderr = await proc.communicate(script.encode())
+        if proc.returncode != 0:
+            return f"Failed to delete database: {stderr.decode(errors='replace')}"
 
         return f"Database '{dbname}' successfully deleted."
 
-    except subprocess.CalledProcessError as e:
-        return f"Failed to delete database: {e.stderr}"
     except Exception as e:
         return f"Error deleting database: {str(e)}"
 
 @mcp.tool()
-def run_sql(dbname: str, query: str, confirm: bool = False) -> str:
+async def run_sql(dbname: str, query: str, confirm: bool = False) -> str:
     """
     Run a raw SQL query on a database.
     WARNING: This can be dangerous. Use with caution.
@@ -243,30 +263,68 @@ def run_sql(dbname: str, query: str, confirm: bool = False) -> str:
     if not confirm:
         return f"WARNING: You are about to execute the following SQL on database '{dbname}':\n\n{query}\n\nThis operation requires confirmation. Call again with confirm=True."
 
-    pg_host = os.getenv("POSTGRES_HOST")
-    pg_port = os.getenv("POSTGRES_PORT")
-    pg_user = os.getenv("POSTGRES_USER")
-    pg_password = os.getenv("POSTGRES_PASSWORD")
+    if SQL_VIA_PSQL:
+        return await _run_sql_psql(dbname, query)
+    return await asyncio.to_thread(_run_sql_libpq, dbname, query)
+
+
+def _run_sql_libpq(dbname: str, query: str) -> str:
+    """run_sql over a psycopg2 connection to dbname"""
+    try:
+        conn = psycopg2.connect(host=PGHOST, port=PGPORT, user=PGUSER, password=PGPASSWORD, dbname=dbname)
+    except psycopg2.Error as e:
+        return f"Error executing SQL: {str(e)}"
+
+    try:
+        # Autocommit: one implicit transaction per call, like psql -c
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(query)
+            output = []
+            if cur.description is not None:
+                lines = [" | ".join(col.name for col in cur.description)]
+                count = 0
+                while rows := cur.fetchmany(SQL_FETCH_ROWS):
+                    count += len(rows)
+                    lines.extend(" | ".join("" if v is None else str(v) for v in row) for row in rows)
+                lines.append(f"({count} row{'' if count == 1 else 's'})")
+                output.append("STDOUT:\n" + "\n".join(lines) + "\n")
+            elif cur.statusmessage:
+                output.append("STDOUT:\n" + cur.statusmessage + "\n")
+            if conn.notices:
+                output.append("STDERR:\n" + "".join(conn.notices))
+
+        return "\n".join(output) if output else "Query executed successfully (no output)."
+
+    except psycopg2.Error as e:
+        return f"SQL execution failed:\n{e.pgerror or str(e)}"
+    finally:
+        conn.close()
 
-    env = os.environ.copy()
-    if pg_password:
-        env["PGPASSWORD"] = pg_password
 
-    cmd = ["psql", "-h", pg_host, "-p", pg_port, "-U", pg_user, "-d", dbname, "-c", query]
+async def _run_sql_psql(dbname: str, query: str) -> str:
+    """run_sql through the psql CLI (meta-commands, no psycopg2)"""
+    cmd = [*PSQL_BASE, "-d", dbname, "-c", query]
 
     try:
-        result = subprocess.run(cmd, env=env, check=True, capture_output=True, text=True)
+        proc = await asyncio.create_subprocess_exec(
+            *cmd, env=backup.PG_ENV, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        stdout, stderr = await proc.communicate()
+        stdout = stdout.decode(errors="replace")
+        stderr = stderr.decode(errors="replace")
+
+        if proc.returncode != 0:
+            return f"SQL execution failed:\nSTDOUT:\n{stdout}\nSTDERR:\n{stderr}"
 
         output = []
-        if result.stdout:
-            output.append("STDOUT:\n" + result.stdout)
-        if result.stderr:
-            output.append("STDERR:\n" + result.stderr)
+        if stdout:
+            output.append("STDOUT:\n" + stdout)
+        if stderr:
+            output.append("STDERR:\n" + stderr)
 
         return "\n".join(output) if output else "Query executed successfully (no output)."
 
-    except subprocess.CalledProcessError as e:
-        return f"SQL execution failed:\nSTDOUT:\n{e.stdout}\nSTDERR:\n{e.stderr}"
     except Exception as e:
         return f"Error executing SQL: {str(e)}"
 
@@ -4,73 +4,74 @@ Quick database creator for new projects.
 Usage: docker exec -it shared-pgbackup python /app/mkdb.py <database name>
 """
 import os
+import re
 import sys
 import subprocess
 
+# Import reusable database helpers from backup.py
+from backup import database_exists, psql_script
+
 PGHOST = os.getenv("POSTGRES_HOST")
 PGPORT = os.getenv("POSTGRES_PORT")
 PGUSER = os.getenv("POSTGRES_USER")
 PGPASSWORD = os.getenv("POSTGRES_PASSWORD")
 
-
-def run(cmd, check=True, capture=False):
-    """Execute command with PGPASSWORD in environment"""
-    env = os.environ.copy()
-    if PGPASSWORD:
-        env["PGPASSWORD"] = PGPASSWORD
-    
-    result = subprocess.run(
-        cmd,
-        env=env,
-        check=check,
-        stdout=subprocess.PIPE if capture else None,
-        stderr=subprocess.PIPE if capture else None,
-        text=True
-    )
-    return result
+# Letters, digits, underscores and hyphens; must not start with a digit or
+# hyphen, at most 63 bytes (Postgres identifier limit)
+_VALID_DBNAME = re.compile(r"\A[A-Za-z_][A-Za-z0-9_-]{0,62}\Z")
 
 
 def db_exists(dbname: str) -> bool:
     """Check if database already exists"""
-    sql = f"SELECT 1 FROM pg_database WHERE datname='{dbname}'"
-    result = run(
-        ["psql", "-h", PGHOST, "-p", PGPORT, "-U", PGUSER, "-d", "postgres", "-tAc", sql],
-        capture=True,
-        check=False
-    )
-    return result.stdout.strip() == "1"
+    return database_exists(dbname)
 
 
-def create_database(dbname: str):
-    """Create new database with Turkish ICU collation settings"""
+def create_database(dbname: str) -> list[str]:
+    """
+    Create new database with Turkish ICU collation settings.
+    Returns progress messages instead of printing them.
+    """
+    # Validated for every caller; quoted below, so hyphens are fine
+    if not _VALID_DBNAME.match(dbname):
+        raise ValueError(f"Invalid database name: {dbname}")
     if db_exists(dbname):
-        print(f"[INFO] Database '{dbname}' already exists")
-        return
+        return [f"[INFO] Database '{dbname}' already exists"]
 
-    print(f"[CREATE] Creating database: {dbname}")
-    run([
-        "psql", "-h", PGHOST, "-p", PGPORT, "-U", PGUSER, "-d", "postgres",
-        "-c", f"CREATE DATABASE {dbname} WITH LOCALE_PROVIDER=icu ICU_LOCALE='tr-TR' TEMPLATE=template0;"
+    messages = [f"[CREATE] Creating database: {dbname}"]
+    psql_script(
+        "postgres",
+        "CREATE DATABASE :\"db\" WITH LOCALE_PROVIDER=icu ICU_LOCALE='tr-TR' TEMPLATE=template0;\n",
+        quiet=True,
+        db=dbname,
+    )
+    messages.append(f"[OK] Database '{dbname}' created successfully")
+    return messages
+
+
+def connection_info(dbname: str) -> str:
+    """Connection string and environment variables for dbname, formatted for display"""
+    conn_string = f"postgresql://{PGUSER}:{PGPASSWORD}@{PGHOST}:{PGPORT}/{dbname}"
+    rule = "=" * 60
+    return "\n".join([
+        "",
+        rule,
+        "DATABASE CONNECTION INFO",
+        rule,
+        f"\n📦 Database: {dbname}",
+        f"🔗 Connection String:\n   {conn_string}",
+        "\n🔧 Environment Variables (.env):",
+        f"   PGHOST={PGHOST}",
+        f"   PGPORT={PGPORT}",
+        f"   PGDATABASE={dbname}",
+        f"   PGUSER={PGUSER}",
+        f"   PGPASSWORD={PGPASSWORD}",
+        "\n" + rule + "\n",
     ])
-    print(f"[OK] Database '{dbname}' created successfully")
 
 
 def print_connection_info(dbname: str):
     """Print connection string and environment variables"""
-    conn_string = f"postgresql://{PGUSER}:{PGPASSWORD}@{PGHOST}:{PGPORT}/{dbname}"
-    
-    print("\n" + "="*60)
-    print("DATABASE CONNECTION INFO")
-    print("="*60)
-    print(f"\n📦 Database: {dbname}")
-    print(f"🔗 Connection String:\n   {conn_string}")
-    print("\n🔧 Environment Variables (.env):")
-    print(f"   PGHOST={PGHOST}")
-    print(f"   PGPORT={PGPORT}")
-    print(f"   PGDATABASE={dbname}")
-    print(f"   PGUSER={PGUSER}")
-    print(f"   PGPASSWORD={PGPASSWORD}")
-    print("\n" + "="*60 + "\n")
+    print(connection_info(dbname))
 
 
 def main():
@@ -83,13 +84,13 @@ def main():
     dbname = sys.argv[1]
     
     # Validate database name (basic check)
-    if not dbname.replace("_", "").replace("-", "").isalnum():
+    if not _VALID_DBNAME.match(dbname):
         print(f"[ERROR] Invalid database name: {dbname}")
-        print("[ERROR] Use only letters, numbers, underscores, and hyphens")
+        print("[ERROR] Use only letters, numbers, underscores, and hyphens (starting with a letter or underscore)")
         sys.exit(1)
     
     try:
-        create_database(dbname)
+        print("\n".join(create_database(dbname)))
         print_connection_info(dbname)
     except subprocess.CalledProcessError as e:
         print(f"[ERROR] Failed to create database: {e}")
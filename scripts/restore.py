@@ -4,32 +4,85 @@ Database restoration tool with safety backup functionality.
 Restores databases from cloud backups with automatic rollback capability.
 """
 import argparse
+import gzip
+import json
 import os
 import sys
-import re
 import subprocess
 import pathlib
 import datetime
+import functools
 import tempfile
 import shutil
-
-# Import reusable dump function from backup.py
-from backup import dump_single_db
+import signal
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+try:
+    import psycopg2
+except ImportError:  # psql CLI fallback
+    psycopg2 = None
+
+# Import reusable dump helpers from backup.py
+from backup import (
+    DUMP_SUFFIXES,
+    PG_ENV,
+    PG_TMP,
+    RCLONE_CHECKERS,
+    RCLONE_COPY_FLAGS,
+    RCLONE_LIST_FLAGS,
+    RETENTION_DAYS,
+    admin_query,
+    database_exists,
+    dump_filename,
+    is_dump_file,
+    prune_cloud_backups,
+    psql_script,
+    stream_db_to_cloud,
+    widen_pipe,
+)
 
 PGHOST = os.getenv("POSTGRES_HOST")
 PGPORT = os.getenv("POSTGRES_PORT")
 PGUSER = os.getenv("POSTGRES_USER")
-PGPASSWORD = os.getenv("POSTGRES_PASSWORD")
 RCLONE_REMOTE = os.getenv("RCLONE_REMOTE", "grdive:")
 SERVER_NAME = os.getenv("SERVER_NAME", "default")
+# Databases smaller than this skip the safety backup (0 = only skip empty ones)
+SAFETY_BACKUP_MIN_MB = float(os.getenv("SAFETY_BACKUP_MIN_MB", "0"))
+# Parallel pg_restore workers for .dump archives. Each one is a session that
+# may claim maintenance_work_mem (RESTORE_PGOPTIONS) for an index build, so the
+# default stays at 4 (4 x 512MB) however many CPUs the shared server has
+RESTORE_JOBS = max(1, int(os.getenv("RESTORE_JOBS", "0")) or min(os.cpu_count() or 1, 4))
+# pg_restore's closing summary when it skipped failing statements and went on
+PG_RESTORE_IGNORED = "errors ignored on restore"
+# .dump archives below this size are streamed even when parallel jobs are requested
+STREAM_RESTORE_MAX_BYTES = 64 << 20
+# Session settings for the processes loading the restore. The target was just
+# dropped and recreated, so losing the last commits to a crash costs nothing
+# (synchronous_commit=off never corrupts, the restore is simply rerun).
+# No --single-transaction: it can't be combined with pg_restore -j, and it
+# implies --exit-on-error, turning a skipped GRANT into a rolled-back restore
+RESTORE_PGOPTIONS = os.getenv(
+    "RESTORE_PGOPTIONS",
+    "-c synchronous_commit=off -c maintenance_work_mem=512MB -c max_parallel_maintenance_workers=4",
+)
+# Read-ahead depth for the heap scans of index builds and ANALYZE during a
+# restore (PostgreSQL 18 issues these as async I/O); 0 keeps the server default
+RESTORE_IO_CONCURRENCY = int(os.getenv("RESTORE_IO_CONCURRENCY", "0"))
+if RESTORE_IO_CONCURRENCY > 0:
+    RESTORE_PGOPTIONS += (
+        f" -c effective_io_concurrency={RESTORE_IO_CONCURRENCY}"
+        f" -c maintenance_io_concurrency={RESTORE_IO_CONCURRENCY}"
+    )
+# Child process environment for the psql/pg_restore processes loading data,
+# built once and shared like backup.PG_ENV (subprocess never mutates it)
+RESTORE_ENV = {**PG_ENV, "PGOPTIONS": f"{PG_ENV.get('PGOPTIONS', '')} {RESTORE_PGOPTIONS}".strip()}
 
 
-def run(cmd, check=True, capture=False, cwd=None, quiet=False):
+def run(cmd, check=True, capture=False, cwd=None, quiet=False, env=PG_ENV):
     """Execute command with PGPASSWORD in environment"""
-    env = os.environ.copy()
-    if PGPASSWORD:
-        env["PGPASSWORD"] = PGPASSWORD
-    
     if not quiet:
         print("[RUN]", " ".join(cmd))
     
@@ -43,35 +96,56 @@ def run(cmd, check=True, capture=False, cwd=None, quiet=False):
     )
 
 
-def list_cloud_backups():
+def iter_lsf(*args: str, quiet: bool = False):
+    """
+    Yield `rclone lsf <args>` entries (trailing "/" stripped) as rclone prints
+    them, without buffering the whole listing. Stopping early kills rclone.
+    Raises CalledProcessError if the listing fails.
+    """
+    cmd = ["rclone", "lsf", *args]
+    if not quiet:
+        print("[RUN]", " ".join(cmd))
+    with subprocess.Popen(
+        cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL if quiet else None, text=True
+    ) as proc:
+        for line in proc.stdout:
+            entry = line.rstrip("\n").rstrip("/")
+            if entry:
+                yield entry
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+
+
+def folder_date(folder: str) -> datetime.date | None:
+    """Date of a "<year>/<month>/<day>" folder path, None if it isn't one"""
+    parts = folder.split("/")
+    if len(parts) != 3:
+        return None
+    try:
+        return datetime.date(int(parts[0]), int(parts[1]), int(parts[2]))
+    except ValueError:
+        return None
+
+
+@functools.lru_cache(maxsize=1)
+def list_cloud_backups() -> tuple[str, ...]:
     """
     List all backup folders in cloud storage (year/month/day structure).
-    Returns list of paths like: ['2025/10/7', '2025/10/6', ...]
+    Returns paths like: ('2025/10/7', '2025/10/6', ...)
+    Cached for the life of the process, long-running callers must
+    call list_cloud_backups.cache_clear() to pick up new backups.
     """
-    result = run(
-        ["rclone", "lsf", f"{RCLONE_REMOTE}records/{SERVER_NAME}/", "--dirs-only", "--recursive"],
-        capture=True,
-        check=True,
-    )
-    
-    folders = result.stdout.decode().strip().split("\n")
-    # Filter year/month/day folders
+    folders = iter_lsf(f"{RCLONE_REMOTE}records/{SERVER_NAME}/", "--dirs-only", "--recursive", *RCLONE_LIST_FLAGS)
+    # Keep valid year/month/day folders, keyed by their date for sorting
     date_folders = []
     for folder in folders:
-        folder = folder.rstrip("/")
-        parts = folder.split("/")
-        if len(parts) == 3:
-            try:
-                # Validate it's a valid date
-                year, month, day = int(parts[0]), int(parts[1]), int(parts[2])
-                datetime.date(year, month, day)
-                date_folders.append(folder)
-            except (ValueError, IndexError):
-                continue
-    
+        date = folder_date(folder)
+        if date is not None:
+            date_folders.append((date, folder))
+
     # Sort by date (newest first)
-    date_folders.sort(key=lambda x: [int(p) for p in x.split("/")], reverse=True)
-    return date_folders
+    date_folders.sort(reverse=True)
+    return tuple(folder for _, folder in date_folders)
 
 
 def latest_cloud_backup():
@@ -82,6 +156,26 @@ def latest_cloud_backup():
     return folders[0]
 
 
+def dump_candidates(db: str) -> list[str]:
+    """Possible dump file names for a database, preferred format first"""
+    return [f"{db}{suffix}" for suffix in DUMP_SUFFIXES.values()]
+
+
+def local_dump_files(folder: pathlib.Path) -> set[str]:
+    """Names of the dump files in folder, one directory scan"""
+    with os.scandir(folder) as entries:
+        return {e.name for e in entries if e.is_file() and is_dump_file(e.name)}
+
+
+def local_dump_path(folder: pathlib.Path, db: str) -> pathlib.Path | None:
+    """Return the preferred dump file for db inside folder, if any"""
+    files = local_dump_files(folder)
+    for name in dump_candidates(db):
+        if name in files:
+            return folder / name
+    return None
+
+
 def download_from_cloud(date_folder: str, local_temp_dir: pathlib.Path, dbname: str | None = None):
     """
     Download backup from cloud to local temp directory.
@@ -89,30 +183,24 @@ def download_from_cloud(date_folder: str, local_temp_dir: pathlib.Path, dbname:
     Args:
         date_folder: Date folder path (e.g. "2025/10/7")
         local_temp_dir: Local temporary directory to download to
-        dbname: If specified, download only this database's .sql file
+        dbname: If specified, download only this database's dump file
     """
+    source = f"{RCLONE_REMOTE}records/{SERVER_NAME}/{date_folder}"
+    filters = []
     if dbname:
-        print(f"[DOWNLOAD] Fetching {dbname}.sql from cloud: {date_folder}")
-        run(
-            [
-                "rclone",
-                "copy",
-                f"{RCLONE_REMOTE}records/{SERVER_NAME}/{date_folder}/{dbname}.sql",
-                str(local_temp_dir),
-                "--progress",
-            ]
-        )
+        print(f"[DOWNLOAD] Fetching {dbname} dump from cloud: {date_folder}")
+        for name in dump_candidates(dbname):
+            filters += ["--include", f"/{name}"]
+        copy_flags = ["--no-traverse"]  # Fresh temp dir, nothing to compare against
     else:
         print(f"[DOWNLOAD] Fetching full backup from cloud: {date_folder}")
-        run(
-            [
-                "rclone",
-                "copy",
-                f"{RCLONE_REMOTE}records/{SERVER_NAME}/{date_folder}",
-                str(local_temp_dir),
-                "--progress",
-            ]
-        )
+        copy_flags = []
+    run(["rclone", "copy", source, str(local_temp_dir), *filters, *RCLONE_COPY_FLAGS, *copy_flags, "--progress"])
+
+    # A corrupt download would only surface halfway through the restore;
+    # compare hashes (sizes if the remote shares no hash type) up front
+    print(f"[VERIFY] Checking download against cloud: {date_folder}")
+    run(["rclone", "check", source, str(local_temp_dir), "--one-way", *filters, "--checkers", RCLONE_CHECKERS])
 
     print(f"[OK] Download completed: {local_temp_dir}")
 
@@ -123,24 +211,14 @@ def parse_date_arg(date_arg: str) -> str:
     Accepts: YYYY-MM-DD or YYYY/MM/DD
     Returns: year/month/day (e.g. "2025/10/7")
     """
-    # Try YYYY-MM-DD format
-    if re.match(r"^\d{4}-\d{1,2}-\d{1,2}$", date_arg):
-        parts = date_arg.split("-")
-        year, month, day = int(parts[0]), int(parts[1]), int(parts[2])
-    # Try YYYY/MM/DD format
-    elif re.match(r"^\d{4}/\d{1,2}/\d{1,2}$", date_arg):
-        parts = date_arg.split("/")
-        year, month, day = int(parts[0]), int(parts[1]), int(parts[2])
-    else:
-        sys.exit(f"ERROR: Invalid date format: {date_arg} (expected YYYY-MM-DD or YYYY/MM/DD)")
-    
-    # Validate date
-    try:
-        datetime.date(year, month, day)
-    except ValueError:
-        sys.exit(f"ERROR: Invalid date: {date_arg}")
-    
-    return f"{year}/{month}/{day}"
+    for fmt in ("%Y-%m-%d", "%Y/%m/%d"):
+        try:
+            date = datetime.datetime.strptime(date_arg, fmt).date()
+        except ValueError:
+            continue
+        return f"{date.year}/{date.month}/{date.day}"
+
+    sys.exit(f"ERROR: Invalid date: {date_arg} (expected YYYY-MM-DD or YYYY/MM/DD)")
 
 
 def find_cloud_backup(date_arg: str | None) -> str:
@@ -161,139 +239,256 @@ def find_cloud_backup(date_arg: str | None) -> str:
     return latest_cloud_backup()
 
 
-def check_file_in_cloud(date_folder: str, filename: str) -> bool:
+def check_file_in_cloud(date_folder: str, *filenames: str) -> bool:
     """
-    Check if a specific file exists in a cloud backup folder using rclone lsf.
+    Check if any of the given files exists in a cloud backup folder using rclone lsf.
     No download needed — just lists remote files.
     """
+    try:
+        return any(
+            name in filenames
+            for name in iter_lsf(f"{RCLONE_REMOTE}records/{SERVER_NAME}/{date_folder}", "--files-only", quiet=True)
+        )
+    except subprocess.CalledProcessError:
+        return False
+
+
+def find_cloud_dump(date_folder: str, db: str) -> tuple[str, int] | None:
+    """
+    Preferred dump file for db in a cloud backup folder as (name, size in bytes).
+    Returns None if the folder holds no dump for db.
+    """
     result = run(
-        ["rclone", "lsf", f"{RCLONE_REMOTE}records/{SERVER_NAME}/{date_folder}", "--files-only"],
+        ["rclone", "lsjson", f"{RCLONE_REMOTE}records/{SERVER_NAME}/{date_folder}", "--files-only", "--no-modtime"],
         capture=True,
         check=False,
         quiet=True,
     )
     if result.returncode != 0:
-        return False
-    files = result.stdout.decode().strip().split("\n")
-    return filename in files
+        return None
+    try:
+        sizes = {entry["Name"]: entry.get("Size", -1) for entry in json.loads(result.stdout or b"[]")}
+    except ValueError:
+        return None
+    for name in dump_candidates(db):
+        if name in sizes:
+            return name, sizes[name]
+    return None
+
+
+def should_stream(filename: str, size: int, jobs: int | None = None) -> bool:
+    """
+    Whether to pipe the dump from cloud straight into the restore.
+    Plain SQL is replayed by a single psql anyway; parallel pg_restore needs a
+    seekable file, so large .dump archives are still downloaded first.
+    """
+    if not filename.endswith(".dump"):
+        return True
+    jobs = jobs or RESTORE_JOBS
+    return jobs == 1 or 0 <= size < STREAM_RESTORE_MAX_BYTES
+
+
+def find_latest_dump_folder(db: str) -> str | None:
+    """
+    Newest date folder (e.g. "2025/10/7") holding a dump for db, found with a
+    single recursive listing filtered to <Y>/<M>/<D>/<db><suffix> (olds/ excluded).
+    Raises CalledProcessError if the listing fails.
+    """
+    includes = []
+    for name in dump_candidates(db):
+        includes += ["--include", f"/*/*/*/{name}"]
+    entries = iter_lsf(
+        f"{RCLONE_REMOTE}records/{SERVER_NAME}/", "--recursive", "--files-only", *includes, *RCLONE_LIST_FLAGS,
+        quiet=True,
+    )
+
+    latest = None
+    for line in entries:
+        folder = line.rpartition("/")[0]
+        date = folder_date(folder)
+        if date is not None and (latest is None or date > latest[0]):
+            latest = (date, folder)
+    return latest[1] if latest else None
 
 
 def guess_latest_cloud_backup_for_db(db: str) -> str:
     """
     Find the most recent cloud backup containing SQL dump for specified database.
-    Uses rclone lsf to check file existence (no download needed).
+    One recursive rclone lsf (no download needed); falls back to checking
+    folder by folder if that listing fails.
     """
-    cloud_folders = list_cloud_backups()
-
-    for date_folder in cloud_folders:
-        print(f"[SEARCH] Checking {date_folder} for {db}.sql...")
+    print(f"[SEARCH] Looking for the latest {db} dump...")
+    try:
+        date_folder = find_latest_dump_folder(db)
+    except subprocess.CalledProcessError:
+        date_folder = None
+        for folder in list_cloud_backups():
+            print(f"[SEARCH] Checking {folder} for {db} dump...")
+            if check_file_in_cloud(folder, *dump_candidates(db)):
+                date_folder = folder
+                break
 
-        if check_file_in_cloud(date_folder, f"{db}.sql"):
-            print(f"[FOUND] Database backup found in: {date_folder}")
-            return date_folder
+    if date_folder:
+        print(f"[FOUND] Database backup found in: {date_folder}")
+        return date_folder
 
     sys.exit(f"ERROR: No backup found for database '{db}' in cloud storage")
 
 
 def db_exists(db: str) -> bool:
-    """Check if database exists"""
-    sql = f"SELECT 1 FROM pg_database WHERE datname='{db}'"
+    """Check if database exists (parameterized, safe for any name)"""
+    return database_exists(db)
+
+
+@dataclass(frozen=True)
+class PreflightResult:
+    """What a restore needs to know about the target database up front"""
+
+    exists: bool
+    empty: bool
+    size: int | None = None  # bytes, None when it could not be read
+
+
+def db_preflight(db: str) -> PreflightResult:
+    """
+    Existence, emptiness (no user table/sequence/matview) and size of db in
+    one psql round trip against db itself. If that can't run, fall back to a
+    plain existence check and treat an existing db as non-empty.
+    """
+    sql = (
+        "SELECT pg_database_size(current_database()), EXISTS ("
+        "SELECT 1 FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE c.relkind IN ('r', 'p', 'm', 'S') "
+        "AND n.nspname NOT IN ('pg_catalog', 'information_schema') "
+        "AND n.nspname NOT LIKE 'pg_toast%')"
+    )
     result = run(
-        ["psql", "-h", PGHOST, "-p", PGPORT, "-U", PGUSER, "-d", "postgres", "-tAc", sql],
+        ["psql", "-h", PGHOST, "-p", PGPORT, "-U", PGUSER, "-d", db, "-tAF", "|", "-c", sql],
         capture=True,
-        check=False
+        check=False,
+        quiet=True,
     )
-    return result.stdout.strip() == b"1"
+    try:
+        size, has_objects = result.stdout.decode().strip().split("|")
+        return PreflightResult(exists=True, empty=has_objects != "t", size=int(size))
+    except ValueError:
+        exists = db_exists(db)
+        return PreflightResult(exists=exists, empty=not exists)
+
+
+def needs_safety_backup(db: str, preflight: PreflightResult | None = None) -> bool:
+    """
+    Whether db holds anything worth a safety backup: it exists, has at least
+    one user table/sequence/matview and is not below SAFETY_BACKUP_MIN_MB.
+    """
+    preflight = preflight or db_preflight(db)
+    if not preflight.exists:
+        return False
+    if preflight.empty:
+        print(f"[INFO] Database '{db}' has no tables, skipping safety backup")
+        return False
+    if preflight.size is not None and preflight.size < SAFETY_BACKUP_MIN_MB * 1024 * 1024:
+        print(f"[INFO] Database '{db}' is below {SAFETY_BACKUP_MIN_MB:g} MB, skipping safety backup")
+        return False
+    return True
 
 
 def terminate_connections(db: str):
     """Kill all active connections to database"""
-    sql = (
-        "SELECT pg_terminate_backend(pid) "
-        f"FROM pg_stat_activity WHERE datname='{db}' AND pid<>pg_backend_pid();"
-    )
-    run(
-        [
-            "psql",
-            "-h", PGHOST,
-            "-p", PGPORT,
-            "-U", PGUSER,
-            "-d", "postgres",
-            "-v", "ON_ERROR_STOP=1",
-            "-c", sql,
-        ],
-        check=False,
-    )
+    sql = "SELECT pg_terminate_backend(pid) FROM pg_stat_activity WHERE datname = {} AND pid <> pg_backend_pid();"
+    print(f"[TERMINATE] Closing connections to: {db}")
+    if psycopg2 is not None:
+        try:
+            admin_query(sql.format("%s"), (db,))
+        except psycopg2.Error as e:
+            print(f"[WARNING] Could not terminate connections: {e}")
+        return
+
+    psql_script("postgres", sql.format(":'db'") + "\n", check=False, quiet=True, db=db)
 
 
-def safety_backup_before_restore(db: str) -> str | None:
+def safety_backup_before_restore(db: str, preflight: PreflightResult | None = None) -> str | None:
     """
     Create a timestamped safety backup before destructive restore operation.
     Uploads directly to cloud (no local storage).
     Returns cloud path for reference.
     """
-    if not db_exists(db):
-        print(f"[INFO] Database '{db}' does not exist yet, skipping safety backup")
+    if not needs_safety_backup(db, preflight):
+        print(f"[INFO] Nothing to protect in '{db}', skipping safety backup")
         return None
     
-    today = datetime.date.today()
-    timestamp = datetime.datetime.now().strftime("%H-%M-%S")
-    filename = f"{db}_before_restore_{timestamp}.sql"
-    cloud_path = f"manual_backups/{SERVER_NAME}/{today.year}/{today.month}/{today.day}"
-    
-    # Create temp file for safety backup
-    temp_dir = pathlib.Path(tempfile.mkdtemp(prefix="safety_backup_"))
-    backup_file = temp_dir / filename
+    now = datetime.datetime.now()
+    filename = dump_filename(f"{db}_before_restore_{now:%H-%M-%S}")
+    # Zero-padded so folders list in date order; cleanup parses them as ints either way
+    cloud_path = f"manual_backups/{SERVER_NAME}/{now:%Y/%m/%d}"
     
     try:
-        print(f"[SAFETY] Creating backup before restore: {filename}")
-        dump_single_db(db, backup_file)
-        
-        # Upload to cloud
-        print(f"[UPLOAD] Uploading safety backup to cloud: {cloud_path}/")
-        run(
-            [
-                "rclone",
-                "copy",
-                str(backup_file),
-                f"{RCLONE_REMOTE}{cloud_path}/",
-            ]
-        )
+        # pg_dump | rclone rcat, the safety dump never touches local disk
+        print(f"[SAFETY] Streaming backup before restore to cloud: {cloud_path}/{filename}")
+        stream_db_to_cloud(db, f"{RCLONE_REMOTE}{cloud_path}/{filename}")
         print(f"[OK] Safety backup uploaded: {cloud_path}/{filename}")
-        
+
         return f"{cloud_path}/{filename}"
-        
+
     except subprocess.CalledProcessError as e:
         print(f"[ERROR] Safety backup failed: {e}")
         return None
-    
-    finally:
-        # Always cleanup temp
-        shutil.rmtree(temp_dir, ignore_errors=True)
 
 
-def drop_create_db(db: str):
-    """Drop and recreate database"""
-    print(f"[DROP] Dropping database: {db}")
-    run(["dropdb", "-h", PGHOST, "-p", PGPORT, "-U", PGUSER, db], check=False)
+def fetch_with_safety_backup(
+    db: str,
+    date_folder: str,
+    temp_dir: pathlib.Path,
+    download: bool = True,
+    safety_backup: bool = True,
+    preflight: PreflightResult | None = None,
+) -> str | None:
+    """
+    Download db's dump into temp_dir while the safety backup of the current
+    db runs; the two are independent (cloud -> disk vs server -> cloud).
+    Returns the safety backup cloud path, if one was made.
+    """
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        fetch = pool.submit(download_from_cloud, date_folder, temp_dir, db) if download else None
+        safety = pool.submit(safety_backup_before_restore, db, preflight) if safety_backup else None
+        if fetch:
+            fetch.result()
+        return safety.result() if safety else None
+
+
+def drop_create_db(db: str, exists: bool = True):
+    """
+    Drop (unless known to be missing) and recreate database.
+    dropdb --force (PostgreSQL 13+) terminates open connections as part of
+    the drop; older servers get terminate_connections + a plain dropdb.
+    """
+    if exists:
+        print(f"[DROP] Dropping database: {db}")
+        dropped = run(["dropdb", "--force", "-h", PGHOST, "-p", PGPORT, "-U", PGUSER, db], check=False)
+        if dropped.returncode != 0:
+            terminate_connections(db)
+            run(["dropdb", "-h", PGHOST, "-p", PGPORT, "-U", PGUSER, db], check=False)
     
     print(f"[CREATE] Creating fresh database: {db}")
     run(["createdb", "-h", PGHOST, "-p", PGPORT, "-U", PGUSER, db])
 
 
-def restore_from_folder(db: str, folder: pathlib.Path, cleanup_after: bool = False):
+def restore_from_folder(db: str, folder: pathlib.Path, cleanup_after: bool = False, jobs: int | None = None):
     """
-    Restore database from SQL backup file.
+    Restore database from a backup file (.dump, .sql or .sql.gz).
+    .dump archives are loaded with `jobs` parallel pg_restore workers
+    (default: RESTORE_JOBS); plain SQL is replayed by a single psql.
     
     Args:
         db: Database name
         folder: Local folder containing backup files
         cleanup_after: If True, delete folder after successful restore
+        jobs: Parallel pg_restore jobs for .dump archives
     """
-    sql_path = folder / f"{db}.sql"
+    sql_path = local_dump_path(folder, db)
 
-    if not sql_path.exists():
-        candidates = sorted([p.name for p in folder.glob("*.sql")])
+    if sql_path is None:
+        candidates = sorted(local_dump_files(folder))
         hint = (
             f"Available SQL files: {', '.join(candidates)}"
             if candidates
@@ -301,20 +496,36 @@ def restore_from_folder(db: str, folder: pathlib.Path, cleanup_after: bool = Fal
         )
         sys.exit(f"ERROR: No backup found for '{db}' in {folder.name}. {hint}")
     
+    psql_cmd = [
+        "psql",
+        "-h", PGHOST,
+        "-p", PGPORT,
+        "-U", PGUSER,
+        "-d", db,
+        "-q",  # Quiet mode
+    ]
+
     print(f"[RESTORE] Loading SQL: {sql_path.name} (this may take a while...)")
     try:
-        run(
-            [
-                "psql",
+        if sql_path.suffix == ".dump":
+            jobs = jobs or RESTORE_JOBS
+            restore_cmd = [
+                "pg_restore",
                 "-h", PGHOST,
                 "-p", PGPORT,
                 "-U", PGUSER,
                 "-d", db,
-                "-q",  # Quiet mode
-                "-f", str(sql_path),
-            ],
-            quiet=True  # Suppress output
-        )
+                "-j", str(jobs),
+                "--no-owner",
+                str(sql_path),
+            ]
+            # Nothing goes to stdout with -d, capture collects pg_restore's messages
+            result = run(restore_cmd, check=False, capture=True, quiet=True, env=RESTORE_ENV)
+            check_pg_restore(restore_cmd, result.returncode, result.stdout)
+        elif sql_path.suffix == ".gz":
+            restore_gzip(sql_path, psql_cmd)
+        else:
+            run(psql_cmd + ["-f", str(sql_path)], quiet=True, env=RESTORE_ENV)  # Suppress output
         print("[OK] Restore completed successfully")
     except subprocess.CalledProcessError:
         print("[ERROR] Restore failed!")
@@ -325,6 +536,134 @@ def restore_from_folder(db: str, folder: pathlib.Path, cleanup_after: bool = Fal
         shutil.rmtree(folder, ignore_errors=True)
 
 
+def check_pg_restore(cmd: list[str], returncode: int, messages: bytes | None):
+    """
+    Print pg_restore's messages and raise CalledProcessError unless the data
+    went in. pg_restore exits 1 both when it gives up and when it merely
+    skipped failing statements (a GRANT to a missing role, a COMMENT ON
+    EXTENSION, ...) and restored everything else, which it reports with an
+    "errors ignored on restore" summary; like psql -f, that is only a warning.
+    """
+    text = (messages or b"").decode("utf-8", "replace").strip()
+    if text:
+        print(text)
+    if returncode == 1 and PG_RESTORE_IGNORED in text:
+        print("[WARNING] pg_restore skipped the failing statements above, everything else was restored")
+    elif returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd, stderr=text)
+
+
+def restore_gzip(sql_path: pathlib.Path, psql_cmd: list[str]):
+    """Decompress a .sql.gz dump on the fly and feed it to psql's stdin"""
+    proc = subprocess.Popen(
+        psql_cmd,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        env=RESTORE_ENV,
+    )
+    widen_pipe(proc.stdin)
+    try:
+        with gzip.open(sql_path, "rb") as src:
+            shutil.copyfileobj(src, proc.stdin, 1 << 20)
+    except BrokenPipeError:
+        pass  # psql exited early, its return code tells why
+    finally:
+        proc.stdin.close()
+
+    if proc.wait() != 0:
+        raise subprocess.CalledProcessError(proc.returncode, psql_cmd)
+
+
+def restore_streaming(db: str, date_folder: str, filename: str):
+    """
+    Restore db by piping `rclone cat` of a cloud dump straight into pg_restore
+    (.dump) or psql (.sql, .sql.gz decompressed in-process), no local copy.
+    """
+    remote_file = f"{RCLONE_REMOTE}records/{SERVER_NAME}/{date_folder}/{filename}"
+    cat_cmd = ["rclone", "cat", remote_file]
+    if filename.endswith(".dump"):
+        restore_cmd = ["pg_restore", "-h", PGHOST, "-p", PGPORT, "-U", PGUSER, "-d", db, "--no-owner"]
+    else:
+        restore_cmd = ["psql", "-h", PGHOST, "-p", PGPORT, "-U", PGUSER, "-d", db, "-q"]
+
+    print(f"[RESTORE] Streaming {remote_file} (this may take a while...)")
+    cat = subprocess.Popen(cat_cmd, stdout=subprocess.PIPE)
+    widen_pipe(cat.stdout)
+    decode_error = None
+    if filename.endswith(".gz"):
+        proc = subprocess.Popen(
+            restore_cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            env=RESTORE_ENV,
+        )
+        widen_pipe(proc.stdin)
+        try:
+            with gzip.GzipFile(fileobj=cat.stdout, mode="rb") as src:
+                shutil.copyfileobj(src, proc.stdin, 1 << 20)
+        except BrokenPipeError:
+            pass  # psql exited early, its return code tells why
+        except (EOFError, OSError, zlib.error) as e:
+            # Truncated or corrupt stream: don't let psql run the half it got
+            decode_error = e
+            proc.kill()
+        finally:
+            try:
+                proc.stdin.close()
+            except BrokenPipeError:
+                pass
+    else:
+        proc = subprocess.Popen(
+            restore_cmd,
+            stdin=cat.stdout,
+            stdout=subprocess.DEVNULL,
+            # pg_restore's messages explain a failure; psql's are dropped as for -f
+            stderr=subprocess.PIPE if filename.endswith(".dump") else subprocess.DEVNULL,
+            env=RESTORE_ENV,
+        )
+    cat.stdout.close()  # Lets rclone receive SIGPIPE if the restore exits
+
+    if decode_error is not None:
+        proc.wait()
+        print("[ERROR] Restore failed!")
+        # An aborted download explains the broken stream better than gzip does
+        if cat.wait() not in (0, -signal.SIGPIPE):
+            raise subprocess.CalledProcessError(cat.returncode, cat_cmd) from decode_error
+        raise decode_error
+    try:
+        if proc.stderr:
+            messages = proc.communicate()[1]
+            check_pg_restore(restore_cmd, proc.returncode, messages)
+        elif proc.wait() != 0:
+            raise subprocess.CalledProcessError(proc.returncode, restore_cmd)
+    except subprocess.CalledProcessError:
+        cat.wait()
+        print("[ERROR] Restore failed!")
+        raise
+    if cat.wait() != 0:
+        print("[ERROR] Restore failed!")
+        raise subprocess.CalledProcessError(cat.returncode, cat_cmd)
+    print("[OK] Restore completed successfully")
+
+
+def remove_temp_dir(temp_dir: pathlib.Path, *filenames: str):
+    """
+    Remove a temp dir expected to hold at most the given files: unlink them
+    and rmdir, falling back to rmtree if anything else turned up.
+    """
+    try:
+        for name in filenames:
+            try:
+                os.unlink(temp_dir / name)
+            except FileNotFoundError:
+                pass
+        os.rmdir(temp_dir)
+    except OSError:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
 def list_tables(db: str):
     """Display tables in database for verification"""
     print("\n[VERIFY] Listing tables in public schema:")
@@ -335,37 +674,9 @@ def list_tables(db: str):
 
 
 def cleanup_old_manual_backups(days: int = 15):
-    """Clean up old manual/safety backups from cloud (year/month/day structure)"""
-    print(f"[CLOUD-CLEANUP] Checking cloud manual backups older than {days} days...")
+    """Clean up old manual/safety backups from cloud (rclone delete --min-age)"""
     try:
-        result = run(
-            ["rclone", "lsf", f"{RCLONE_REMOTE}manual_backups/{SERVER_NAME}/", "--dirs-only", "--recursive"],
-            capture=True,
-            check=False,
-        )
-        
-        if result.returncode == 0:
-            cutoff_date = datetime.date.today() - datetime.timedelta(days=days)
-            folders = result.stdout.decode().strip().split("\n")
-            
-            for folder in folders:
-                folder = folder.rstrip("/")
-                parts = folder.split("/")
-                if len(parts) == 3:
-                    try:
-                        year, month, day = int(parts[0]), int(parts[1]), int(parts[2])
-                        folder_date = datetime.date(year, month, day)
-                        
-                        if folder_date < cutoff_date:
-                            print(f"[CLOUD-DELETE] {folder}")
-                            run(
-                                ["rclone", "purge", f"{RCLONE_REMOTE}manual_backups/{SERVER_NAME}/{folder}"],
-                                check=False,
-                            )
-                    except (ValueError, IndexError):
-                        continue
-        
-        print("[OK] Cloud cleanup completed")
+        prune_cloud_backups(days, f"manual_backups/{SERVER_NAME}/")
     except Exception as e:
         print(f"[WARN] Cloud cleanup failed: {e}")
 
@@ -384,11 +695,15 @@ Examples:
   
   # Skip safety backup
   python restore.py my_django_db --skip-safety-backup
+
+  # Limit parallel pg_restore workers
+  python restore.py my_django_db --jobs 2
         """
     )
     ap.add_argument("dbname", help="Database name to restore")
     ap.add_argument("date", nargs="?", help="Backup date (YYYY-MM-DD), auto-detects latest if omitted")
     ap.add_argument("--skip-safety-backup", action="store_true", help="Don't create safety backup before restore")
+    ap.add_argument("--jobs", type=int, help="Parallel pg_restore jobs for .dump backups (default: RESTORE_JOBS, else 4 or the CPU count if lower)")
     args = ap.parse_args()
 
     db = args.dbname
@@ -405,30 +720,49 @@ Examples:
     print(f"[INFO] Server        : {PGUSER}@{PGHOST}:{PGPORT}")
     print("="*60 + "\n")
 
-    # Download only the single .sql file from cloud
-    temp_dir = pathlib.Path(tempfile.mkdtemp(prefix="restore_"))
+    dump = find_cloud_dump(date_folder, db)
+    if dump is None:
+        sys.exit(f"ERROR: No backup for '{db}' in {date_folder}.")
+    stream = should_stream(*dump, jobs=args.jobs)
+
+    temp_dir = pathlib.Path(tempfile.mkdtemp(prefix="restore_", dir=PG_TMP))
     try:
-        download_from_cloud(date_folder, temp_dir, dbname=db)
+        # One look at the current target decides safety backup, terminate and drop
+        preflight = db_preflight(db)
+
+        # Download the single dump file (unless streaming) alongside the
+        # safety backup, both before anything destructive happens
+        safety_cloud_path = fetch_with_safety_backup(
+            db,
+            date_folder,
+            temp_dir,
+            download=not stream,
+            safety_backup=not args.skip_safety_backup,
+            preflight=preflight,
+        )
 
         # Verify backup was downloaded
-        if not (temp_dir / f"{db}.sql").exists():
+        if not stream and local_dump_path(temp_dir, db) is None:
             sys.exit(f"ERROR: No backup for '{db}' in {date_folder}.")
 
-        # Safety backup (before destructive operation)
-        safety_cloud_path = None
-        if not args.skip_safety_backup:
-            safety_cloud_path = safety_backup_before_restore(db)
-            if safety_cloud_path:
-                print(f"[INFO] Safety backup stored in cloud: {RCLONE_REMOTE}{safety_cloud_path}\n")
-        else:
+        if args.skip_safety_backup:
             print("[WARN] Safety backup skipped\n")
+        elif safety_cloud_path:
+            print(f"[INFO] Safety backup stored in cloud: {RCLONE_REMOTE}{safety_cloud_path}\n")
 
-        # Terminate connections and recreate DB
-        terminate_connections(db)
-        drop_create_db(db)
+        # Recreate DB (the drop terminates open connections)
+        drop_create_db(db, exists=preflight.exists)
+
+        # Housekeeping with nothing depending on it: prune old safety backups
+        # while the restore runs instead of after it
+        cleanup = threading.Thread(target=cleanup_old_manual_backups, args=(RETENTION_DAYS,), daemon=True)
+        cleanup.start()
 
         # Restore data
-        restore_from_folder(db, temp_dir)
+        if stream:
+            restore_streaming(db, date_folder, dump[0])
+        else:
+            restore_from_folder(db, temp_dir, jobs=args.jobs)
 
         # Verify
         list_tables(db)
@@ -438,11 +772,14 @@ Examples:
         if safety_cloud_path:
             print(f"[INFO] Safety backup: {RCLONE_REMOTE}{safety_cloud_path}")
         print("="*60 + "\n")
+
+        # Best effort: give the cleanup a moment to finish, don't hold the exit for it
+        cleanup.join(timeout=30)
         
     finally:
         # Always cleanup temp directory
         print(f"[CLEANUP] Removing temporary files: {temp_dir}")
-        shutil.rmtree(temp_dir, ignore_errors=True)
+        remove_temp_dir(temp_dir, dump[0])
 
 
 if __name__ == "__main__":
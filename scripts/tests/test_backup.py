@@ -0,0 +1,157 @@
+"""
+Tests for backup.py streaming uploads, run against fake pg_dump/rclone binaries.
+Run: python -m unittest discover -s scripts/tests
+"""
+import os
+import pathlib
+import shutil
+import subprocess
+import sys
+import tempfile
+import textwrap
+import unittest
+from unittest import mock
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+import backup  # noqa: E402
+
+
+class StreamDbToCloudTest(unittest.TestCase):
+    def setUp(self):
+        self.bin_dir = pathlib.Path(tempfile.mkdtemp(prefix="fakebin_"))
+        self.calls = self.bin_dir / "calls"
+        self.addCleanup(shutil.rmtree, self.bin_dir, ignore_errors=True)
+        path = f"{self.bin_dir}{os.pathsep}{os.environ.get('PATH', '')}"
+        # PG_ENV is a snapshot of os.environ taken at import, patch both
+        for patcher in (
+            mock.patch.dict(os.environ, {"PATH": path}),
+            mock.patch.dict(backup.PG_ENV, {"PATH": path}),
+            mock.patch.multiple(backup, PGHOST="localhost", PGPORT="5432", PGUSER="postgres"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def fake(self, name: str, body: str):
+        script = self.bin_dir / name
+        script.write_text(f"#!/bin/sh\necho \"{name} $*\" >> {self.calls}\n{textwrap.dedent(body)}")
+        script.chmod(0o755)
+
+    def logged(self) -> list[str]:
+        return self.calls.read_text().splitlines() if self.calls.exists() else []
+
+    def test_rcat_failure_is_reported_as_rclone_error(self):
+        # pg_dump keeps writing until the pipe breaks, rclone dies right away
+        self.fake("pg_dump", "yes dump | head -c 50000000\n")
+        self.fake("rclone", 'case "$1" in rcat) exit 5;; esac\n')
+
+        with self.assertRaises(subprocess.CalledProcessError) as ctx:
+            backup.stream_db_to_cloud("db", "remote:records/x/db.dump")
+
+        self.assertEqual(ctx.exception.cmd[0], "rclone")
+        self.assertEqual(ctx.exception.returncode, 5)
+        self.assertFalse(any(call.startswith("rclone deletefile") for call in self.logged()))
+
+    def test_pg_dump_failure_deletes_partial_upload(self):
+        self.fake("pg_dump", "echo partial; exit 1\n")
+        self.fake("rclone", 'case "$1" in rcat) cat > /dev/null;; esac\n')
+
+        with self.assertRaises(subprocess.CalledProcessError) as ctx:
+            backup.stream_db_to_cloud("db", "remote:records/x/db.dump")
+
+        self.assertEqual(ctx.exception.cmd[0], "pg_dump")
+        self.assertIn("rclone deletefile remote:records/x/db.dump", self.logged())
+
+    def test_rcat_failure_marks_single_backup_partial(self):
+        self.fake("pg_dump", "yes dump | head -c 50000000\n")
+        self.fake("rclone", 'case "$1" in rcat) exit 5;; esac\n')
+
+        with mock.patch.object(backup, "BACKUP_LOCAL_STAGE", False):
+            result = backup.backup_single_database("db")
+
+        self.assertEqual(result["status"], "partial")
+        self.assertFalse(result["cloud_uploaded"])
+
+
+class PsqlScriptTest(unittest.TestCase):
+    def setUp(self):
+        self.bin_dir = pathlib.Path(tempfile.mkdtemp(prefix="fakebin_"))
+        self.addCleanup(shutil.rmtree, self.bin_dir, ignore_errors=True)
+        path = f"{self.bin_dir}{os.pathsep}{os.environ.get('PATH', '')}"
+        for patcher in (
+            mock.patch.dict(backup.PG_ENV, {"PATH": path}),
+            mock.patch.multiple(backup, PGHOST="localhost", PGPORT="5432", PGUSER="postgres", psycopg2=None),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        # Echoes its arguments, one per line, then the script it was given
+        script = self.bin_dir / "psql"
+        script.write_text('#!/bin/sh\nfor arg in "$@"; do echo "$arg"; done\ncat\n')
+        script.chmod(0o755)
+
+    def test_variables_and_script_are_passed_separately(self):
+        result = backup.psql_script("postgres", "SELECT :'name';\n", name="it's; DROP")
+
+        lines = result.stdout.splitlines()
+        self.assertIn("ON_ERROR_STOP=1", lines)
+        self.assertIn("name=it's; DROP", lines)
+        self.assertEqual(lines[-1], "SELECT :'name';")
+
+
+class OperationalError(Exception):
+    pass
+
+
+class InterfaceError(Exception):
+    pass
+
+
+class FakeConnection:
+    """psycopg2-like connection whose queries fail once the server dropped it"""
+
+    def __init__(self, rows, dropped=False):
+        self.rows = rows
+        self.dropped = dropped
+        self.closed = 0
+        self.autocommit = False
+
+    def cursor(self):
+        cur = mock.MagicMock(description=[("datname",)])
+        cur.__enter__.return_value = cur
+        cur.execute.side_effect = self.execute
+        cur.fetchall.return_value = self.rows
+        return cur
+
+    def execute(self, sql, params=None):
+        if self.dropped:
+            self.closed = 2
+            raise OperationalError("server closed the connection unexpectedly")
+
+
+class AdminQueryTest(unittest.TestCase):
+    def setUp(self):
+        self.psycopg2 = mock.Mock(OperationalError=OperationalError, InterfaceError=InterfaceError)
+        for patcher in (
+            mock.patch.object(backup, "psycopg2", self.psycopg2),
+            mock.patch.object(backup, "_admin_conn", None),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_dropped_connection_is_reopened_and_query_retried(self):
+        self.psycopg2.connect.side_effect = [FakeConnection([], dropped=True), FakeConnection([("app",)])]
+
+        self.assertEqual(backup.list_databases(), ["app"])
+        self.assertEqual(self.psycopg2.connect.call_count, 2)
+
+    def test_query_errors_on_a_live_connection_are_not_retried(self):
+        conn = FakeConnection([])
+        conn.execute = mock.Mock(side_effect=OperationalError("canceling statement due to timeout"))
+        self.psycopg2.connect.return_value = conn
+
+        with self.assertRaises(OperationalError):
+            backup.list_databases()
+        self.assertEqual(self.psycopg2.connect.call_count, 1)
+
+if __name__ == "__main__":
+    unittest.main()
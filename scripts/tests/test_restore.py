@@ -0,0 +1,119 @@
+"""
+Tests for restore.py streaming restores, run against fake rclone/psql binaries.
+Run: python -m unittest discover -s scripts/tests
+"""
+import gzip
+import os
+import pathlib
+import shutil
+import subprocess
+import sys
+import tempfile
+import textwrap
+import unittest
+from unittest import mock
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+import restore  # noqa: E402
+
+
+class RestoreStreamingTest(unittest.TestCase):
+    def setUp(self):
+        self.bin_dir = pathlib.Path(tempfile.mkdtemp(prefix="fakebin_"))
+        self.addCleanup(shutil.rmtree, self.bin_dir, ignore_errors=True)
+        # Half of a gzip stream: decompression ends before the end-of-stream marker
+        dump = gzip.compress(b"SELECT 1;\n" * 100000)
+        (self.bin_dir / "dump.sql.gz").write_bytes(dump[: len(dump) // 2])
+        path = f"{self.bin_dir}{os.pathsep}{os.environ.get('PATH', '')}"
+        # The env dicts are snapshots of os.environ taken at import, patch all
+        for patcher in (
+            mock.patch.dict(os.environ, {"PATH": path}),
+            mock.patch.dict(restore.RESTORE_ENV, {"PATH": path}),
+            mock.patch.multiple(restore, PGHOST="localhost", PGPORT="5432", PGUSER="postgres"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.fake("psql", "cat > /dev/null\n")
+
+    def fake(self, name: str, body: str):
+        script = self.bin_dir / name
+        script.write_text(f"#!/bin/sh\n{textwrap.dedent(body)}")
+        script.chmod(0o755)
+
+    def test_aborted_download_raises_rclone_error(self):
+        self.fake("rclone", f"cat {self.bin_dir / 'dump.sql.gz'}; exit 1\n")
+
+        with self.assertRaises(subprocess.CalledProcessError) as ctx:
+            restore.restore_streaming("db", "2025/10/7", "db.sql.gz")
+
+        self.assertEqual(ctx.exception.cmd[:2], ["rclone", "cat"])
+
+    def test_truncated_stream_from_successful_download_raises_decode_error(self):
+        self.fake("rclone", f"cat {self.bin_dir / 'dump.sql.gz'}\n")
+
+        with self.assertRaises(EOFError):
+            restore.restore_streaming("db", "2025/10/7", "db.sql.gz")
+
+    def test_dump_ignored_errors_are_a_warning(self):
+        self.fake("rclone", "echo PGDMP\n")
+        self.fake("pg_restore", """\
+            cat > /dev/null
+            echo 'pg_restore: warning: errors ignored on restore: 1' >&2
+            exit 1
+        """)
+
+        restore.restore_streaming("db", "2025/10/7", "db.dump")
+
+    def test_dump_failure_raises_with_pg_restore_messages(self):
+        self.fake("rclone", "echo PGDMP\n")
+        self.fake("pg_restore", "echo 'pg_restore: error: input file is too short' >&2\nexit 1\n")
+
+        with self.assertRaises(subprocess.CalledProcessError) as ctx:
+            restore.restore_streaming("db", "2025/10/7", "db.dump")
+
+        self.assertEqual(ctx.exception.cmd[0], "pg_restore")
+        self.assertIn("input file is too short", ctx.exception.stderr)
+
+
+class RestoreFromFolderTest(unittest.TestCase):
+    def setUp(self):
+        self.bin_dir = pathlib.Path(tempfile.mkdtemp(prefix="fakebin_"))
+        self.addCleanup(shutil.rmtree, self.bin_dir, ignore_errors=True)
+        self.folder = self.bin_dir / "restore"
+        self.folder.mkdir()
+        (self.folder / "db.dump").write_bytes(b"PGDMP")
+        path = f"{self.bin_dir}{os.pathsep}{os.environ.get('PATH', '')}"
+        for patcher in (
+            mock.patch.dict(restore.RESTORE_ENV, {"PATH": path}),
+            mock.patch.multiple(restore, PGHOST="localhost", PGPORT="5432", PGUSER="postgres"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def fake_pg_restore(self, message: str, status: int):
+        script = self.bin_dir / "pg_restore"
+        script.write_text(f"#!/bin/sh\necho '{message}' >&2\nexit {status}\n")
+        script.chmod(0o755)
+
+    def test_ignored_errors_are_a_warning(self):
+        self.fake_pg_restore("pg_restore: warning: errors ignored on restore: 2", 1)
+
+        with mock.patch("builtins.print") as printed:
+            restore.restore_from_folder("db", self.folder, jobs=2)
+
+        output = [call.args[0] for call in printed.call_args_list if call.args]
+        self.assertIn("pg_restore: warning: errors ignored on restore: 2", output)
+        self.assertIn("[OK] Restore completed successfully", output)
+
+    def test_fatal_error_raises_with_pg_restore_messages(self):
+        self.fake_pg_restore('pg_restore: error: could not open input file "db.dump"', 1)
+
+        with self.assertRaises(subprocess.CalledProcessError) as ctx:
+            restore.restore_from_folder("db", self.folder, jobs=2)
+
+        self.assertIn("could not open input file", ctx.exception.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()